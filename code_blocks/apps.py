@@ -6,3 +6,28 @@ class CodeBlocksAppConfig(AppConfig):
     label = 'code_blocks'
     verbose_name = 'Wagtail Code Blocks'
     default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        from . import checks  # noqa: F401
+        from .util.pygments import defaults
+
+        if defaults.CODE_BLOCK_PYGMENTS_PRELOAD:
+            from .util.pygments.backends import preload
+
+            preload(defaults.CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES)
+
+        if defaults.CODE_BLOCK_PYGMENTS_TIMEOUT is not None:
+            from .util.pygments.guard import start_pool
+
+            # Fork the guard workers now, after preloading (so they inherit the lexers), not from a request.
+            start_pool()
+
+        if defaults.CODE_BLOCK_PYGMENTS_WARM_PAGES:
+            from .blocks.pygments.warm import warm_on_first_request
+
+            warm_on_first_request()
+
+        if defaults.CODE_BLOCK_PYGMENTS_STALE_WRITE_BACK:
+            from .blocks.pygments.stale import write_back_on_request_finished
+
+            write_back_on_request_finished()
@@ -1,5 +1,5 @@
 import itertools
-from functools import lru_cache, cache
+from functools import lru_cache
 
 from django.core.exceptions import ValidationError
 from django import forms
@@ -7,25 +7,57 @@ from django.forms.utils import ErrorList
 from django.utils.safestring import mark_safe
 from wagtail import blocks
 
-from pygments import highlight
-from pygments.lexers import get_lexer_by_name, guess_lexer
 from wagtail.blocks.struct_block import StructBlockValidationError
 
+from ...util.pygments import cache as highlight_cache
+from ...util.pygments.backends import get_backend, get_default_backend
+from ...util.pygments.fingerprint import fingerprint
 from ...util.pygments.formatter import CustomHtmlFormatter
+from ...util.pygments.guard import HighlightLimitExceeded, report_limit, run_guarded
+from ...util.pygments.registry import RegistryValidator
 from ...util.pygments.defaults import (
     CODE_BLOCK_PYGMENTS_LANGUAGES,
     CODE_BLOCK_PYGMENTS_STYLES,
     CODE_BLOCK_PYGMENTS_LINENO_CHOICES,
-    CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS
+    CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS,
+    CODE_BLOCK_PYGMENTS_FORMATTER_CACHE_SIZE,
+    CODE_BLOCK_PYGMENTS_STYLE_PAIRS,
+    CODE_BLOCK_PYGMENTS_STALE_CHECK,
+    CODE_BLOCK_PYGMENTS_STALE_CHECK_MISSING,
 )
 
 from .. import ValueBlock
+from .stale import note_stale
+from .widget import RegistryChoiceWidget
 
 __all__ = "PygmentsCodeBlock",
 
 
 class HtmlFieldBlock(blocks.FieldBlock):
-    field = forms.CharField(widget=forms.HiddenInput)
+    # Not required: it's set by PygmentsCodeBlock.clean() from the cleaned value.
+    field = forms.CharField(required=False, widget=forms.HiddenInput)
+
+
+class FingerprintFieldBlock(blocks.FieldBlock):
+    field = forms.CharField(required=False, widget=forms.HiddenInput)
+
+
+class RegistryChoiceBlock(blocks.FieldBlock):
+    """Choice of a shared registry key (language or style).
+
+    Unlike ChoiceBlock, the choices are not serialized into each block definition:
+    the widget looks them up from the shared registry, and values are validated
+    against the registry's frozen key set.
+    """
+    def __init__(self, registry, required=True, help_text=None, validators=(), **kwds):
+        self.registry = registry
+        self.field = forms.CharField(
+            required=required,
+            help_text=help_text,
+            validators=[RegistryValidator(registry), *validators],
+            widget=RegistryChoiceWidget(registry),
+        )
+        super().__init__(**kwds)
 
 
 class PygmentsCodeBlock(blocks.StructBlock):
@@ -38,12 +70,9 @@ class PygmentsCodeBlock(blocks.StructBlock):
         - Add a "Copy to clipboard" button.
         - Add a reset button for editable.
     """
-    language = blocks.ChoiceBlock(choices=CODE_BLOCK_PYGMENTS_LANGUAGES.items(),
-                                  default=next(iter(CODE_BLOCK_PYGMENTS_LANGUAGES.keys())))
-    style = blocks.ChoiceBlock(choices=CODE_BLOCK_PYGMENTS_STYLES.items(),
-                               default=next(iter(CODE_BLOCK_PYGMENTS_STYLES.keys())))
-    style_dark = blocks.ChoiceBlock(choices=CODE_BLOCK_PYGMENTS_STYLES.items(),
-                                    required=False, )
+    language = RegistryChoiceBlock("languages", default=next(iter(CODE_BLOCK_PYGMENTS_LANGUAGES.keys())))
+    style = RegistryChoiceBlock("styles", default=next(iter(CODE_BLOCK_PYGMENTS_STYLES.keys())))
+    style_dark = RegistryChoiceBlock("styles", required=False)
     heading = blocks.CharBlock(required=False, default="")
     corner_text = blocks.CharBlock(required=False, default="", help_text="Defaults to language name.")
     show_corner_text = blocks.BooleanBlock(required=False, default=True)
@@ -55,6 +84,7 @@ class PygmentsCodeBlock(blocks.StructBlock):
     editable = blocks.BooleanBlock(required=False, default=False)
     code = blocks.TextBlock(form_classname="code-block-code")
     html = HtmlFieldBlock()
+    fingerprint = FingerprintFieldBlock()
 
     MUTABLE_META_ATTRIBUTES = ["default", "disabled", "hidden", "block_class"]
 
@@ -258,7 +288,26 @@ class PygmentsCodeBlock(blocks.StructBlock):
 
         return next(iter(self.child_blocks.keys()))
 
+    def __clean_choices(self, value):
+        """Validate the language and style choices, which must be valid before highlighting."""
+        errors = {}
+
+        for field in ("language", "style", "style_dark"):
+            if field not in self.child_blocks:
+                continue
+
+            try:
+                value[field] = self.child_blocks[field].clean(value.get(field))
+            except ValidationError as error:
+                errors[field] = ErrorList([error])
+
+        if errors:
+            raise StructBlockValidationError(errors)
+
     def clean(self, value):
+        # The pickers are free text inputs: reject unknown keys before they reach the highlighter.
+        self.__clean_choices(value)
+
         corner_text = self.__value_or_hidden(value, "corner_text")
         show_corner_text = self.__value_or_hidden(value, "show_corner_text")
         editable = self.__value_or_hidden(value, "editable")
@@ -290,29 +339,55 @@ class PygmentsCodeBlock(blocks.StructBlock):
 
         if language == "auto":
             code = self.__value_or_hidden(value, "code")
-            lexer = guess_lexer(code)
 
-            for alias in lexer.__class__.aliases:
+            try:
+                aliases, name = run_guarded(code, PygmentsCodeBlock._guess_language, code)
+            except HighlightLimitExceeded as exc:
+                report_limit(exc, language=language, operation="guess")
+
+                if exc.transient:
+                    raise self.__unavailable_error()
+
+                aliases, name = ("text",), "Text only"
+
+            for alias in aliases:
                 if alias in CODE_BLOCK_PYGMENTS_LANGUAGES:
-                    language = lexer.__class__.aliases[0]
+                    language = aliases[0]
                     self.language = value["language"] = language
                     break
                 else:
                     error = ValidationError(
-                        f"Auto-detected language {lexer.__class__.name} is not present in CODE_BLOCK_PYGMENTS_LANGUAGES."
+                        f"Auto-detected language {name} is not present in CODE_BLOCK_PYGMENTS_LANGUAGES."
                     )
 
                     raise StructBlockValidationError({
                         self.__error_field("language", "code"): ErrorList([error]),
                     })
 
-        value["html"] = ""
-        value["html"] = self.render_basic(value)
+        value = super().clean(value)
+
+        # Highlight the cleaned value (cleaning strips the code), so that the fingerprint matches at render time.
+        args = self.get_highlight_args(value)
+
+        try:
+            value["html"] = PygmentsCodeBlock.highlight(*args)
+        except HighlightLimitExceeded:
+            # Don't store a plain text fallback for a pool that's only busy (or just crashed).
+            raise self.__unavailable_error()
 
-        return super().clean(value)
+        value["fingerprint"] = fingerprint(args)
+
+        return value
+
+    def __unavailable_error(self):
+        error = ValidationError("Highlighting is temporarily unavailable, please try saving again.")
+
+        return StructBlockValidationError({
+            self.__error_field("code", "language"): ErrorList([error]),
+        })
 
     @staticmethod
-    @cache
+    @lru_cache(maxsize=CODE_BLOCK_PYGMENTS_FORMATTER_CACHE_SIZE)
     def get_formatter(
             heading, title, block_class, cssclass, colorclass, style,
             style_dark, linenos, max_height, resizable, fit_content, editable
@@ -338,23 +413,105 @@ class PygmentsCodeBlock(blocks.StructBlock):
             editable=editable,
         )
 
+    @staticmethod
+    def _guess_language(code):
+        return get_default_backend().detect(code)
+
     @staticmethod
     @lru_cache(maxsize=1024)
     def highlight(
             language, style, style_dark, linenos, editable, resizable, fit_content, max_height,
             corner_text, show_corner_text, heading, code, block_class
     ):
+        """Highlight code, using the shared highlight cache (if configured) behind this LRU cache.
+
+        Raises a transient HighlightLimitExceeded (not cached) when the worker pool is busy or crashed.
+        """
+        return highlight_cache.get_or_set(
+            (
+                language, style, style_dark, linenos, editable, resizable, fit_content, max_height,
+                corner_text, show_corner_text, heading, code, block_class
+            ),
+            PygmentsCodeBlock.highlight_guarded,
+        )
+
+    @staticmethod
+    def highlight_guarded(
+            language, style, style_dark, linenos, editable, resizable, fit_content, max_height,
+            corner_text, show_corner_text, heading, code, block_class
+    ):
+        """Highlight code within the configured size/time limits, falling back to escaped plain text.
+
+        Transient failures (see HighlightLimitExceeded) are raised instead, as their fallback mustn't be
+        cached: see ``highlight_fallback``.
+        """
+        args = (
+            style, style_dark, linenos, editable, resizable, fit_content, max_height,
+            corner_text, show_corner_text, heading, code, block_class
+        )
+
+        if language != "auto" and get_backend(language).bounded:
+            return PygmentsCodeBlock._highlight(language, *args)
+
+        try:
+            return run_guarded(code, PygmentsCodeBlock._highlight, language, *args)
+        except HighlightLimitExceeded as exc:
+            report_limit(exc, language=language, operation="highlight")
+
+            if exc.transient:
+                raise
+
+        return PygmentsCodeBlock.highlight_fallback(language, *args)
+
+    @staticmethod
+    def highlight_fallback(
+            language, style, style_dark, linenos, editable, resizable, fit_content, max_height,
+            corner_text, show_corner_text, heading, code, block_class
+    ):
+        """The code as escaped plain text, keeping the requested language in the corner text."""
+        if show_corner_text and not corner_text and language != "auto":
+            corner_text = language.upper()
+
+        return PygmentsCodeBlock._highlight(
+            "text", style, style_dark, linenos, editable, resizable, fit_content, max_height,
+            corner_text, show_corner_text, heading, code, block_class
+        )
+
+    @staticmethod
+    def _highlight(
+            language, style, style_dark, linenos, editable, resizable, fit_content, max_height,
+            corner_text, show_corner_text, heading, code, block_class
+    ):
+        backend, lexer_language, html_formatter = PygmentsCodeBlock.get_highlighter(
+            language, style, style_dark, linenos, editable, resizable, fit_content, max_height,
+            corner_text, show_corner_text, heading, code, block_class
+        )
+
+        return backend.highlight(code, lexer_language, html_formatter)
+
+    @staticmethod
+    def get_highlighter(
+            language, style, style_dark, linenos, editable, resizable, fit_content, max_height,
+            corner_text, show_corner_text, heading, code, block_class
+    ):
+        """The backend, lexer language and formatter for highlighting (detecting the language of auto)."""
         cssclass = CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS
         colorclass = f"{cssclass}-{style}"
 
-        if style_dark:
+        if style_dark and (style, style_dark) in CODE_BLOCK_PYGMENTS_STYLE_PAIRS:
+            # One combined style sheet handles both schemes.
+            colorclass = f"{colorclass}--{style_dark}"
+            style_dark = None
+        elif style_dark:
             style_dark = f"{cssclass}-{style_dark}"
 
         if language == "auto":
-            lexer = guess_lexer(code)
-            language = lexer.__class__.name
+            aliases, language = get_default_backend().detect(code)
+            backend = get_backend(aliases[0])
+            lexer_language = aliases[0]
         else:
-            lexer = get_lexer_by_name(language)
+            backend = get_backend(language)
+            lexer_language = language
 
         title = corner_text or (language.upper() if show_corner_text else "")
 
@@ -373,31 +530,52 @@ class PygmentsCodeBlock(blocks.StructBlock):
             editable,
         )
 
-        return highlight(code, lexer, html_formatter)
+        return backend, lexer_language, html_formatter
+
+    def get_comparison_class(self):
+        from .compare import PygmentsCodeBlockComparison
+        return PygmentsCodeBlockComparison
+
+    def get_highlight_args(self, value):
+        """The positional arguments to ``highlight()`` for a block value."""
+        return (
+            self.__value_or_hidden(value, "language"),
+            self.__value_or_hidden(value, "style"),
+            self.__value_or_hidden(value, "style_dark"),
+            self.__value_or_hidden(value, "linenos"),
+            self.__value_or_hidden(value, "editable"),
+            self.__value_or_hidden(value, "resizable"),
+            self.__value_or_hidden(value, "fit_content"),
+            self.__value_or_hidden(value, "max_height"),
+            self.__value_or_hidden(value, "corner_text"),
+            self.__value_or_hidden(value, "show_corner_text"),
+            self.__value_or_hidden(value, "heading"),
+            self.__value_or_hidden(value, "code"),
+            self.meta.block_class,
+        )
 
     def render_basic(self, value, context=None):
         html = value.get("html", "")
+        value_fingerprint = value.get("fingerprint")
 
-        if not html:
-            language = self.__value_or_hidden(value, "language")
-            style = self.__value_or_hidden(value, "style")
-            style_dark = self.__value_or_hidden(value, "style_dark")
-            linenos = self.__value_or_hidden(value, "linenos")
-            editable = self.__value_or_hidden(value, "editable")
-            resizable = self.__value_or_hidden(value, "resizable")
-            fit_content = self.__value_or_hidden(value, "fit_content")
-            max_height = self.__value_or_hidden(value, "max_height")
-            corner_text = self.__value_or_hidden(value, "corner_text")
-            show_corner_text = self.__value_or_hidden(value, "show_corner_text")
-            heading = self.__value_or_hidden(value, "heading")
-            code = self.__value_or_hidden(value, "code")
+        # Html stored before fingerprints is of unknown freshness: it's served as is unless opted in,
+        # as re-highlighting every such block on every render would cost as much as storing no html.
+        check = value_fingerprint or CODE_BLOCK_PYGMENTS_STALE_CHECK_MISSING
 
-            block_class = self.meta.block_class
+        if html and not (CODE_BLOCK_PYGMENTS_STALE_CHECK and check):
+            # noinspection DjangoSafeString
+            return mark_safe(html)
 
-            html = PygmentsCodeBlock.highlight(
-                language, style, style_dark, linenos, editable, resizable, fit_content, max_height,
-                corner_text, show_corner_text, heading, code, block_class
-            )
+        args = self.get_highlight_args(value)
+
+        if not html or value_fingerprint != fingerprint(args):
+            try:
+                html = PygmentsCodeBlock.highlight(*args)
+            except HighlightLimitExceeded:
+                # Served uncached, and retried on the next render.
+                html = PygmentsCodeBlock.highlight_fallback(*args)
+
+            note_stale(context)
 
         # noinspection DjangoSafeString
         return mark_safe(html)
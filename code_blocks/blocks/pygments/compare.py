@@ -0,0 +1,215 @@
+"""Revision comparison for PygmentsCodeBlock.
+
+Options are compared like a struct block, the baked ``html`` is ignored, and ``code`` gets a
+line-based diff in which only changed hunks (plus context) are highlighted, line by line,
+through a cache shared by both revisions. Code over the highlight size limits is shown as escaped
+plain text, like it's rendered.
+"""
+import difflib
+from functools import lru_cache
+
+from django.utils.html import escape, format_html, format_html_join
+from django.utils.safestring import mark_safe
+from pygments import highlight
+from pygments.formatters.html import HtmlFormatter
+from pygments.lexers import find_lexer_class_by_name
+from pygments.lexers.special import TextLexer
+from pygments.util import ClassNotFound
+
+# noinspection PyProtectedMember
+from wagtail.admin.compare import StructBlockComparison, get_comparison_class_for_block
+
+from ...util.pygments.guard import HighlightLimitExceeded, check_limits
+
+__all__ = "PygmentsCodeBlockComparison",
+
+
+@lru_cache(maxsize=256)
+def _get_lexer_class(language):
+    try:
+        return find_lexer_class_by_name(language)
+    except ClassNotFound:
+        return TextLexer
+
+
+def _get_lexer(language):
+    # A new instance each time, as some lexers keep state on the instance while lexing.
+    return _get_lexer_class(language)(stripnl=False, ensurenl=False)
+
+
+@lru_cache(maxsize=64)
+def _get_formatter(style):
+    try:
+        return HtmlFormatter(style=style, nowrap=True, noclasses=True)
+    except ClassNotFound:
+        return HtmlFormatter(nowrap=True, noclasses=True)
+
+
+@lru_cache(maxsize=8192)
+def highlight_line(language, style, line):
+    """Highlight a single line with inline styles (the admin doesn't load the style sheets)."""
+    if not line:
+        return ""
+
+    try:
+        check_limits(line)
+    except HighlightLimitExceeded:
+        language = "text"
+
+    if language == "text":
+        return escape(line)
+
+    return highlight(line, _get_lexer(language), _get_formatter(style)).rstrip("\n")
+
+
+def _pre_style(style):
+    return f"background: {_get_formatter(style).style.background_color}; padding: .5em"
+
+
+class PygmentsCodeBlockComparison(StructBlockComparison):
+    IGNORED_FIELDS = ("code", "html", "fingerprint")
+    CONTEXT_LINES = 3
+    MAX_VALUE_LINES = 200
+
+    def _get(self, val, field):
+        try:
+            return val[field]
+        except (KeyError, TypeError):
+            return self.block.meta.hidden.get(field)
+
+    def _language_style(self, val):
+        language = self._get(val, "language") or "text"
+        style = self._get(val, "style") or "default"
+
+        try:
+            check_limits(self._get(val, "code") or "")
+        except HighlightLimitExceeded:
+            language = "text"
+
+        return ("text" if language == "auto" else language), style
+
+    def _option_blocks(self):
+        return [
+            (name, block) for name, block in self.block.child_blocks.items()
+            if name not in self.IGNORED_FIELDS
+        ]
+
+    def _code_label(self):
+        block = self.block.child_blocks.get("code")
+        return block.label if block else "Code"
+
+    def has_changed(self):
+        return any(
+            self._get(self.val_a, name) != self._get(self.val_b, name)
+            for name in self.block.child_blocks
+            if name not in ("html", "fingerprint")
+        )
+
+    def _numbered_lines(self, lines, language, style):
+        width = len(str(len(lines)))
+
+        return format_html_join(
+            "\n", '<span class="lineno" style="opacity: .5; user-select: none">{}</span> {}',
+            (
+                (str(number).rjust(width), mark_safe(highlight_line(language, style, line)))
+                for number, line in enumerate(lines, 1)
+            ),
+        )
+
+    def htmlvalue(self, val):
+        htmlvalues = [
+            (
+                block.label,
+                get_comparison_class_for_block(block)(
+                    block, True, True, self._get(val, name), self._get(val, name)
+                ).htmlvalue(self._get(val, name)),
+            )
+            for name, block in self._option_blocks()
+        ]
+
+        language, style = self._language_style(val)
+        lines = (self._get(val, "code") or "").splitlines()
+        code = self._numbered_lines(lines[:self.MAX_VALUE_LINES], language, style)
+
+        if len(lines) > self.MAX_VALUE_LINES:
+            code = format_html("{}\n… {} more lines", code, len(lines) - self.MAX_VALUE_LINES)
+
+        htmlvalues.append((self._code_label(), format_html('<pre style="{}">{}</pre>', _pre_style(style), code)))
+
+        return format_html(
+            "<dl>\n{}\n</dl>",
+            format_html_join("\n", "    <dt>{}</dt>\n    <dd>{}</dd>", htmlvalues),
+        )
+
+    def htmldiff(self):
+        htmldiffs = [
+            (
+                block.label,
+                get_comparison_class_for_block(block)(
+                    block, self.exists_a, self.exists_b, self._get(self.val_a, name), self._get(self.val_b, name)
+                ).htmldiff(),
+            )
+            for name, block in self._option_blocks()
+        ]
+
+        htmldiffs.append((self._code_label(), self.code_diff()))
+
+        return format_html(
+            "<dl>\n{}\n</dl>",
+            format_html_join("\n", "    <dt>{}</dt>\n    <dd>{}</dd>", htmldiffs),
+        )
+
+    def code_diff(self):
+        lines_a = (self._get(self.val_a, "code") or "").splitlines()
+        lines_b = (self._get(self.val_b, "code") or "").splitlines()
+        language_a, style_a = self._language_style(self.val_a)
+        language_b, style_b = self._language_style(self.val_b)
+
+        if lines_a == lines_b:
+            return format_html("<pre>{}</pre>", escape("(unchanged)"))
+
+        matcher = difflib.SequenceMatcher(None, lines_a, lines_b)
+        hunks = []
+
+        for group in matcher.get_grouped_opcodes(self.CONTEXT_LINES):
+            a_start, b_start = group[0][1], group[0][3]
+            a_end, b_end = group[-1][2], group[-1][4]
+
+            rows = [format_html(
+                '<span class="hunk" style="opacity: .6">@@ -{},{} +{},{} @@</span>',
+                a_start + 1, a_end - a_start, b_start + 1, b_end - b_start,
+            )]
+
+            for tag, i1, i2, j1, j2 in group:
+                if tag == "equal":
+                    rows.extend(
+                        format_html("  {}", mark_safe(highlight_line(language_b, style_b, line)))
+                        for line in lines_b[j1:j2]
+                    )
+                    continue
+
+                if tag in ("replace", "delete"):
+                    rows.extend(
+                        format_html(
+                            '<span class="deletion">- {}</span>',
+                            mark_safe(highlight_line(language_a, style_a, line)),
+                        )
+                        for line in lines_a[i1:i2]
+                    )
+
+                if tag in ("replace", "insert"):
+                    rows.extend(
+                        format_html(
+                            '<span class="addition">+ {}</span>',
+                            mark_safe(highlight_line(language_b, style_b, line)),
+                        )
+                        for line in lines_b[j1:j2]
+                    )
+
+            hunks.append(mark_safe("\n".join(rows)))
+
+        return format_html(
+            '<pre class="code-block-diff" style="{}">{}</pre>',
+            _pre_style(style_b),
+            mark_safe("\n".join(hunks)),
+        )
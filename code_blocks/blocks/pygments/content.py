@@ -0,0 +1,106 @@
+"""Helpers for finding code block values in page content."""
+from django.apps import apps
+from wagtail import blocks
+from wagtail.fields import StreamField
+
+from .block import PygmentsCodeBlock
+
+__all__ = (
+    "iter_block_values",
+    "iter_page_code_blocks",
+    "iter_pages_code_blocks",
+    "iter_code_block_fields",
+    "iter_objects_code_blocks",
+)
+
+
+def iter_block_values(block, value):
+    """Yield (block, value) for every PygmentsCodeBlock within a block value."""
+    if value is None:
+        return
+
+    if isinstance(block, PygmentsCodeBlock):
+        yield block, value
+
+    elif isinstance(block, blocks.StreamBlock):
+        for child in value:
+            yield from iter_block_values(child.block, child.value)
+
+    elif isinstance(block, blocks.ListBlock):
+        for item in value:
+            yield from iter_block_values(block.child_block, item)
+
+    elif isinstance(block, blocks.StructBlock):
+        for name, child_block in block.child_blocks.items():
+            yield from iter_block_values(child_block, value.get(name))
+
+
+def iter_page_code_blocks(page):
+    """Yield (field name, block, value) for every PygmentsCodeBlock in a page's StreamFields."""
+    for field in page._meta.get_fields():
+        if isinstance(field, StreamField):
+            for block, value in iter_block_values(field.stream_block, getattr(page, field.name)):
+                yield field.name, block, value
+
+
+def iter_pages_code_blocks(pages, revisions=False):
+    """Yield (page, field name, block, value) for pages, and optionally their latest draft revisions."""
+    for page in pages:
+        page = page.specific
+
+        for field_name, block, value in iter_page_code_blocks(page):
+            yield page, field_name, block, value
+
+        if revisions and page.has_unpublished_changes:
+            draft = page.get_latest_revision_as_object()
+
+            for field_name, block, value in iter_page_code_blocks(draft):
+                yield draft, field_name, block, value
+
+
+def _contains_code_block(block, seen=None):
+    seen = set() if seen is None else seen
+
+    if id(block) in seen:
+        return False
+
+    seen.add(id(block))
+
+    if isinstance(block, PygmentsCodeBlock):
+        return True
+
+    if isinstance(block, blocks.ListBlock):
+        return _contains_code_block(block.child_block, seen)
+
+    if isinstance(block, (blocks.StreamBlock, blocks.StructBlock)):
+        return any(_contains_code_block(child, seen) for child in block.child_blocks.values())
+
+    return False
+
+
+def iter_code_block_fields():
+    """Yield (model, field) for the StreamFields of all models that can contain a PygmentsCodeBlock.
+
+    Fields are yielded for the model that defines them only, so multi-table inheritance doesn't repeat them.
+    """
+    for model in apps.get_models():
+        for field in model._meta.local_fields:
+            if isinstance(field, StreamField) and _contains_code_block(field.stream_block):
+                yield model, field
+
+
+def iter_objects_code_blocks(revisions=False):
+    """Yield (object, field name, block, value, is revision) for all code blocks in the database.
+
+    With ``revisions``, the latest draft revision of objects with unpublished changes is included.
+    """
+    for model, field in iter_code_block_fields():
+        for obj in model._default_manager.iterator():
+            for block, value in iter_block_values(field.stream_block, getattr(obj, field.name)):
+                yield obj, field.name, block, value, False
+
+            if revisions and getattr(obj, "has_unpublished_changes", False) and obj.latest_revision_id:
+                draft = obj.get_latest_revision_as_object()
+
+                for block, value in iter_block_values(field.stream_block, getattr(draft, field.name)):
+                    yield draft, field.name, block, value, True
@@ -0,0 +1,355 @@
+"""Bulk import of source files into code block values on pages.
+
+Files are read as streams from a directory or a zip/tar archive, their language is picked from the
+file name (see ``util.pygments.filenames``) and they are highlighted in a process pool. Values are
+built with their html and fingerprint directly, without a clean() per block, and are written to
+pages in batches.
+"""
+import codecs
+import logging
+import multiprocessing
+import os
+import posixpath
+import tarfile
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from fnmatch import fnmatch
+from functools import partial
+
+from django.db import connections, transaction
+from django.utils.text import slugify
+from wagtail import blocks
+
+from ...util.pygments import cache as highlight_cache
+from ...util.pygments.defaults import CODE_BLOCK_PYGMENTS_LANGUAGE_KEYS, CODE_BLOCK_PYGMENTS_WORKERS
+from ...util.pygments.filenames import language_for_filename
+from ...util.pygments.fingerprint import fingerprint
+from ...util.pygments.guard import HighlightLimitExceeded
+from .block import PygmentsCodeBlock, RegistryChoiceBlock
+
+__all__ = (
+    "iter_source_files",
+    "read_text",
+    "page_writer",
+    "import_files",
+)
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def iter_source_files(source, include=(), exclude=()):
+    """Yield (relative path, opener) for the files of a directory, or a zip or tar archive.
+
+    Directories are walked in sorted order, archives in their own order. Hidden files and
+    directories are skipped; ``include`` and ``exclude`` are glob patterns matched against file names.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                relpath = os.path.relpath(path, source).replace(os.sep, "/")
+
+                if _included(relpath, include, exclude):
+                    yield relpath, partial(open, path, "rb")
+
+    elif not os.path.isfile(source):
+        raise ValueError(f"No such file or directory: {source}")
+
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                relpath = _archive_path(info.filename)
+
+                if not info.is_dir() and _included(relpath, include, exclude):
+                    yield relpath, partial(archive.open, info)
+
+    elif tarfile.is_tarfile(source):
+        # Stream mode: each member is read before moving on, so compressed archives are read once.
+        with tarfile.open(source, "r|*") as archive:
+            for member in archive:
+                relpath = _archive_path(member.name)
+
+                if member.isfile() and _included(relpath, include, exclude):
+                    yield relpath, partial(archive.extractfile, member)
+
+    else:
+        raise ValueError(f"Not a directory, or a zip or tar archive: {source}")
+
+
+def _archive_path(name):
+    return posixpath.normpath(name).lstrip("/")
+
+
+def _included(relpath, include, exclude):
+    parts = relpath.split("/")
+    name = parts[-1]
+
+    if any(part.startswith(".") for part in parts):
+        return False
+
+    if include and not any(fnmatch(name, pattern) for pattern in include):
+        return False
+
+    return not any(fnmatch(name, pattern) for pattern in exclude)
+
+
+def read_text(opener, max_bytes=None, encoding="utf-8-sig"):
+    """Read a file as text in chunks. None for binary files (with NUL bytes) and files over ``max_bytes``."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parts = []
+    size = 0
+
+    with opener() as stream:
+        while chunk := stream.read(READ_CHUNK_SIZE):
+            size += len(chunk)
+
+            if b"\0" in chunk or (max_bytes is not None and size > max_bytes):
+                return None
+
+            parts.append(decoder.decode(chunk))
+
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+def page_writer(field_name, block_name, page=None, parent=None, page_model=None, live=False):
+    """A callable writing batches of (group, block values) to pages, one transaction per batch.
+
+    Values are appended to ``page``, or to a child page of ``parent`` per group: created (as a
+    ``page_model``, titled after the group) on first write, and appended to afterwards. Returns
+    the IDs of the written pages.
+
+    Pages with revisions are appended to as a new revision (the editor loads the latest one),
+    published if the page was live without unpublished changes, and left as a draft otherwise.
+    """
+    page_pks = {}
+    slugs = set(parent.get_children().values_list("slug", flat=True)) if parent is not None else set()
+
+    def append(pk, values):
+        target = page_model.objects.get(pk=pk)
+
+        if target.latest_revision_id is None:
+            # No revisions (e.g. created by this import): the content is edited in place.
+            stream = getattr(target, field_name)
+
+            for value in values:
+                stream.append((block_name, value))
+
+            page_model.objects.filter(pk=pk).update(**{field_name: stream})
+            return
+
+        publish = target.live and not target.has_unpublished_changes
+        target = target.get_latest_revision_as_object()
+        stream = getattr(target, field_name)
+
+        for value in values:
+            stream.append((block_name, value))
+
+        # Values are already highlighted: skip full_clean(), which would clean every block again.
+        revision = target.save_revision(clean=False)
+
+        if publish:
+            revision.publish()
+
+    def create(group, values):
+        title = group or "Imported code"
+        slug = base = slugify(title)[:240] or "code"
+        suffix = 1
+
+        while slug in slugs:
+            suffix += 1
+            slug = f"{base}-{suffix}"
+
+        slugs.add(slug)
+
+        child = page_model(title=title[:255], slug=slug, live=live, has_unpublished_changes=not live)
+        setattr(child, field_name, [(block_name, value) for value in values])
+        parent.add_child(instance=child)
+        return child.pk
+
+    if page is not None:
+        page_model = type(page)
+
+    def write(batch):
+        written = set()
+
+        with transaction.atomic():
+            if page is not None:
+                # One revision per batch.
+                append(page.pk, [value for _, values in batch for value in values])
+                written.add(page.pk)
+
+            else:
+                for group, values in batch:
+                    if group in page_pks:
+                        append(page_pks[group], values)
+                    else:
+                        page_pks[group] = create(group, values)
+
+                    written.add(page_pks[group])
+
+        return written
+
+    return write
+
+
+def _block_languages(block):
+    """Languages a block accepts, or None if its language is fixed."""
+    language_block = block.child_blocks.get("language")
+
+    if isinstance(language_block, RegistryChoiceBlock):
+        return CODE_BLOCK_PYGMENTS_LANGUAGE_KEYS
+
+    if isinstance(language_block, blocks.ChoiceBlock):
+        return frozenset(str(key) for key, _ in language_block.field.choices if key)
+
+    return None
+
+
+def _group(relpath, depth):
+    return "/".join(relpath.split("/")[:-1][:depth])
+
+
+def _highlight_task(args):
+    return args, PygmentsCodeBlock.highlight_guarded(*args)
+
+
+def import_files(files, block, write, depth=1, fallback="text", max_bytes=None, headings=True,
+                 workers=CODE_BLOCK_PYGMENTS_WORKERS, batch=50):
+    """Import (relative path, opener) pairs as values of ``block``, passing batches of (group, values) to ``write``.
+
+    ``write`` returns the IDs of the pages it wrote (see ``page_writer``). Files are grouped by the
+    first ``depth`` directories of their path. Files without a language for their name get the
+    ``fallback`` language (or are skipped if it's None). Returns a dict of counts: ``files``,
+    ``imported``, ``skipped``, ``failed``, ``pages`` (written pages) and ``languages``.
+    """
+    started = time.monotonic()
+    languages = _block_languages(block)
+    stats = {"files": 0, "imported": 0, "skipped": 0, "failed": 0, "pages": 0, "languages": Counter()}
+
+    groups = {}
+    pages = set()
+    inflight = {}
+    ready = []
+    open_group = None
+    window = max(1, workers) * 8
+
+    def collect(done):
+        results = {}
+
+        for future in done:
+            group, index, value = inflight.pop(future)
+            entry = groups[group]
+            entry["pending"] -= 1
+
+            try:
+                args, html = future.result()
+            except HighlightLimitExceeded as exc:
+                # Transient (see highlight_guarded): imported without html, to be highlighted on render (or healed).
+                logger.warning("Failed to highlight %s: %r", value.get("heading") or group, exc)
+                stats["failed"] += 1
+                value["html"] = value["fingerprint"] = ""
+                entry["values"][index] = value
+                continue
+            except Exception as exc:
+                logger.warning("Failed to highlight %s: %r", value.get("heading") or group, exc)
+                stats["failed"] += 1
+                continue
+
+            value["html"] = html
+            value["fingerprint"] = fingerprint(args)
+            entry["values"][index] = value
+            results[args] = html
+
+        highlight_cache.set_many(results)
+
+    def flush(force=False):
+        nonlocal ready
+
+        for group, entry in list(groups.items()):
+            if group != open_group and not entry["pending"]:
+                del groups[group]
+
+                if entry["values"]:
+                    ready.append((group, [value for _, value in sorted(entry["values"].items())]))
+
+        if ready and (force or len(ready) >= batch):
+            pages.update(write(ready))
+            stats["pages"] = len(pages)
+            ready = []
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+
+    # Forked children must not share the parent's database connections.
+    connections.close_all()
+
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context) as executor:
+        for relpath, opener in files:
+            stats["files"] += 1
+
+            if languages is None:
+                language = None
+            else:
+                language = language_for_filename(relpath, languages) or fallback
+
+                if language is None:
+                    stats["skipped"] += 1
+                    continue
+
+            code = read_text(opener, max_bytes=max_bytes)
+            code = code and code.strip()
+
+            if not code:
+                stats["skipped"] += 1
+                continue
+
+            if languages is not None:
+                # Extensions of several lexers (e.g. ".pl") are resolved by their content.
+                language = language_for_filename(relpath, languages, code) or fallback
+
+            group = _group(relpath, depth)
+
+            if group != open_group:
+                open_group = group
+                flush()
+
+            value = block.get_default()
+            value["code"] = code
+
+            if language is not None:
+                value["language"] = language
+
+            if headings and "heading" in block.child_blocks:
+                value["heading"] = relpath
+
+            args = block.get_highlight_args(value)
+            stats["languages"][args[0]] += 1
+            stats["imported"] += 1
+
+            entry = groups.setdefault(group, {"values": {}, "pending": 0, "count": 0})
+            inflight[executor.submit(_highlight_task, args)] = group, entry["count"], value
+            entry["count"] += 1
+            entry["pending"] += 1
+
+            while len(inflight) >= window:
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        open_group = None
+
+        if inflight:
+            done, _ = wait(inflight)
+            collect(done)
+
+    flush(force=True)
+
+    stats["imported"] -= stats["failed"]
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    return stats
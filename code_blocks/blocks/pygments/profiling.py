@@ -0,0 +1,326 @@
+"""Offline profiling of the code block content of a site.
+
+Every code block in the database (and optionally in latest draft revisions) is re-highlighted in a
+process pool, timing preparation (language detection, formatter setup), lexing and formatting
+separately, optionally under cProfile in the workers. Blocks over the highlight limits are profiled as the plain text they're served as.
+Each worker highlights a sample first, keeping its one-off setup out of the timings, and blocks that take longer than
+``CODE_BLOCK_PYGMENTS_TIMEOUT`` are interrupted and reported as timed out.
+"""
+import cProfile
+import hashlib
+import multiprocessing
+import os
+import signal
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.db import connections
+from multiprocessing.util import Finalize
+
+from ...util.pygments.defaults import (
+    CODE_BLOCK_PYGMENTS_MAX_BYTES,
+    CODE_BLOCK_PYGMENTS_MAX_LINES,
+    CODE_BLOCK_PYGMENTS_STYLES,
+    CODE_BLOCK_PYGMENTS_TIMEOUT,
+    CODE_BLOCK_PYGMENTS_WORKERS,
+)
+from ...util.pygments.guard import HighlightLimitExceeded, check_limits
+from .block import PygmentsCodeBlock
+from .content import iter_objects_code_blocks
+
+__all__ = (
+    "profile",
+    "percentile",
+)
+
+# Input size reported as oversized when no highlight limits are configured.
+OVERSIZED_BYTES = 100_000
+OVERSIZED_LINES = 2_000
+
+# Highlighted by each worker before profiling (detection loads every lexer).
+WARM_UP_CODE = """\
+def main(argv):
+    return len(argv)
+"""
+
+_profiler = None
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def _init_worker(profile_dir):
+    global _profiler
+
+    # Pay for imports, language detection and formatter setup up front, not in the first block's prepare time.
+    PygmentsCodeBlock._highlight(
+        "auto", next(iter(CODE_BLOCK_PYGMENTS_STYLES)), None, None, False, False, False, None, "", True, "",
+        WARM_UP_CODE, ""
+    )
+
+    if CODE_BLOCK_PYGMENTS_TIMEOUT is not None:
+        signal.signal(signal.SIGALRM, _timed_out)
+
+    if profile_dir:
+        _profiler = cProfile.Profile()
+        path = os.path.join(profile_dir, f"{os.getpid()}.prof")
+
+        # Finalizers with an exit priority run when pool workers exit (unlike atexit).
+        Finalize(_profiler, _profiler.dump_stats, args=(path,), exitpriority=10)
+
+
+def _timed_out(signum, frame):
+    raise HighlightLimitExceeded("timeout", CODE_BLOCK_PYGMENTS_TIMEOUT)
+
+
+def _set_alarm(elapsed=0.0):
+    """Interrupt this (main) thread with HighlightLimitExceeded when the timeout, less ``elapsed``, is up."""
+    if CODE_BLOCK_PYGMENTS_TIMEOUT is not None:
+        # Never zero, which would cancel the alarm instead.
+        signal.setitimer(signal.ITIMER_REAL, max(CODE_BLOCK_PYGMENTS_TIMEOUT - elapsed, 1e-6))
+
+
+def _cancel_alarm():
+    if CODE_BLOCK_PYGMENTS_TIMEOUT is not None:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _profile_task(args):
+    code = args[11]
+
+    if _profiler is not None:
+        _profiler.enable()
+
+    try:
+        started = time.perf_counter()
+        _set_alarm()
+        backend, lexer_language, formatter = PygmentsCodeBlock.get_highlighter(*args)
+        _cancel_alarm()
+        prepared = time.perf_counter()
+
+        # Keep one-off lexer compilation (per worker process) out of the lex time, and out of the timeout, as
+        # interrupting it would leave the lexer class unusable.
+        backend.preload([lexer_language])
+        lexing = time.perf_counter()
+        _set_alarm(prepared - started)
+        tokens = list(backend.lex(code, lexer_language))
+        lexed = time.perf_counter()
+        html = backend.format(tokens, formatter)
+        formatted = time.perf_counter()
+    finally:
+        _cancel_alarm()
+
+        if _profiler is not None:
+            _profiler.disable()
+
+    return {
+        "prepare": prepared - started,
+        "lex": lexed - lexing,
+        "format": formatted - lexed,
+        "html_bytes": len(html.encode()),
+    }
+
+
+def _is_oversized(code):
+    if CODE_BLOCK_PYGMENTS_MAX_BYTES is not None or CODE_BLOCK_PYGMENTS_MAX_LINES is not None:
+        try:
+            check_limits(code)
+        except HighlightLimitExceeded:
+            return True
+
+        return False
+
+    return len(code.encode()) > OVERSIZED_BYTES or code.count("\n") >= OVERSIZED_LINES
+
+
+def _describe(model, pk, title):
+    """Object details, with the page's URL and admin edit link for pages."""
+    from django.apps import apps
+    from django.urls import NoReverseMatch, reverse
+    from wagtail.models import Page
+
+    description = {"model": model, "pk": pk, "title": title, "url": None, "admin_url": None}
+
+    if issubclass(apps.get_model(model), Page):
+        page = Page.objects.filter(pk=pk).first()
+        description["url"] = page.get_full_url() if page is not None else None
+
+        try:
+            description["admin_url"] = reverse("wagtailadmin_pages:edit", args=[pk])
+        except NoReverseMatch:
+            pass
+
+    return description
+
+
+def profile(revisions=True, workers=CODE_BLOCK_PYGMENTS_WORKERS, slowest=10, profile_dir=None):
+    """Profile the highlighting of all code blocks. Returns a JSON-serializable report.
+
+    With ``profile_dir``, each worker writes its cProfile stats there as ``<pid>.prof``.
+    """
+    started = time.monotonic()
+    totals = Counter()
+    languages = defaultdict(
+        lambda: {"blocks": 0, "source_bytes": 0, "html_bytes": 0, "fresh_html_bytes": 0, "timings": []}
+    )
+    hashes = Counter()
+    blocks = []
+    inflight = {}
+    window = max(1, workers) * 8
+
+    def collect(done):
+        for future in done:
+            index = inflight.pop(future)
+            block = blocks[index]
+
+            try:
+                block.update(future.result())
+            except HighlightLimitExceeded as exc:
+                block["timed_out"] = exc.reason == "timeout"
+                block["error"] = repr(exc)
+                totals["timed_out" if block["timed_out"] else "errors"] += 1
+            except Exception as exc:
+                block["error"] = repr(exc)
+                totals["errors"] += 1
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+
+    # Forked children must not share the parent's database connections.
+    connections.close_all()
+
+    executor = ProcessPoolExecutor(
+        max_workers=max(1, workers), mp_context=context, initializer=_init_worker, initargs=(profile_dir,)
+    )
+
+    with executor:
+        for obj, field_name, block, value, is_revision in iter_objects_code_blocks(revisions=revisions):
+            try:
+                args = block.get_highlight_args(value)
+            except ValueError:
+                totals["skipped"] += 1
+                continue
+
+            language, linenos, code = args[0], args[3], args[11]
+            oversized = _is_oversized(code)
+
+            if oversized:
+                # Served as escaped plain text (see PygmentsCodeBlock.highlight_guarded).
+                args = ("text", *args[1:])
+
+            totals["blocks"] += 1
+            totals["revision_blocks"] += is_revision
+            totals["auto"] += language == "auto"
+            totals["linenos"] += bool(linenos)
+            totals["oversized"] += oversized
+            hashes[hashlib.sha1(code.encode()).digest()] += 1
+
+            blocks.append({
+                "object": (obj._meta.label, obj.pk, str(obj)),
+                "field": field_name,
+                "revision": is_revision,
+                "language": language,
+                "source_bytes": len(code.encode()),
+                "stored_html_bytes": len((value.get("html") or "").encode()),
+            })
+
+            inflight[executor.submit(_profile_task, args)] = len(blocks) - 1
+
+            while len(inflight) >= window:
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        if inflight:
+            done, _ = wait(inflight)
+            collect(done)
+
+    for block in blocks:
+        if "error" in block:
+            continue
+
+        stats = languages[block["language"]]
+        stats["blocks"] += 1
+        stats["source_bytes"] += block["source_bytes"]
+        stats["html_bytes"] += block["stored_html_bytes"]
+        stats["fresh_html_bytes"] += block["html_bytes"]
+        stats["timings"].append((block["prepare"], block["lex"], block["format"]))
+
+    def timing_summary(values):
+        return {
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            "max_ms": round(max(values, default=0.0) * 1000, 3),
+            "total_ms": round(sum(values) * 1000, 3),
+        }
+
+    report_languages = {}
+
+    for language, stats in sorted(languages.items(), key=lambda item: -item[1]["blocks"]):
+        prepare, lex, format_ = zip(*stats["timings"]) if stats["timings"] else ((), (), ())
+
+        report_languages[language] = {
+            "blocks": stats["blocks"],
+            "source_bytes": stats["source_bytes"],
+            "html_bytes": stats["html_bytes"],
+            "fresh_html_bytes": stats["fresh_html_bytes"],
+            "prepare": timing_summary(prepare),
+            "lex": timing_summary(lex),
+            "format": timing_summary(format_),
+        }
+
+    timed = [block for block in blocks if "error" not in block]
+    timed.sort(key=lambda block: block["prepare"] + block["lex"] + block["format"], reverse=True)
+
+    report_slowest = [
+        {
+            **_describe(*block["object"]),
+            "field": block["field"],
+            "revision": block["revision"],
+            "language": block["language"],
+            "source_bytes": block["source_bytes"],
+            "total_ms": round((block["prepare"] + block["lex"] + block["format"]) * 1000, 3),
+            "prepare_ms": round(block["prepare"] * 1000, 3),
+            "lex_ms": round(block["lex"] * 1000, 3),
+            "format_ms": round(block["format"] * 1000, 3),
+        }
+        for block in timed[:slowest]
+    ]
+
+    report_timed_out = [
+        {
+            **_describe(*block["object"]),
+            "field": block["field"],
+            "revision": block["revision"],
+            "language": block["language"],
+            "source_bytes": block["source_bytes"],
+        }
+        for block in blocks if block.get("timed_out")
+    ]
+
+    unique = len(hashes)
+
+    return {
+        "blocks": totals["blocks"],
+        "revision_blocks": totals["revision_blocks"],
+        "skipped": totals["skipped"],
+        "errors": totals["errors"],
+        "timed_out": totals["timed_out"],
+        "auto": totals["auto"],
+        "linenos": totals["linenos"],
+        "oversized": totals["oversized"],
+        "source_bytes": sum(stats["source_bytes"] for stats in report_languages.values()),
+        "html_bytes": sum(stats["html_bytes"] for stats in report_languages.values()),
+        "fresh_html_bytes": sum(stats["fresh_html_bytes"] for stats in report_languages.values()),
+        "unique_sources": unique,
+        "duplicate_ratio": round(1 - unique / totals["blocks"], 4) if totals["blocks"] else 0.0,
+        "prepare": timing_summary([block["prepare"] for block in timed]),
+        "lex": timing_summary([block["lex"] for block in timed]),
+        "format": timing_summary([block["format"] for block in timed]),
+        "languages": report_languages,
+        "slowest": report_slowest,
+        "timed_out_blocks": report_timed_out,
+        "seconds": round(time.monotonic() - started, 3),
+    }
@@ -0,0 +1,149 @@
+"""Detection and lazy repair of stale code block html.
+
+Code blocks store their html with a fingerprint of the engine and options that produced it (see
+``util.pygments.fingerprint``). At render time, html with a different fingerprint is re-highlighted
+through the highlight caches and counted in ``STATS``; html stored without a fingerprint only with
+``CODE_BLOCK_PYGMENTS_STALE_CHECK_MISSING`` (the heal_code_blocks command rewrites it). With
+``CODE_BLOCK_PYGMENTS_STALE_WRITE_BACK``, the rendered page is queued and its stored html is
+rewritten once the response has been sent.
+"""
+import logging
+import threading
+from collections import Counter
+
+from django.core.signals import request_finished
+from django.db import transaction
+
+from ...util.pygments.defaults import CODE_BLOCK_PYGMENTS_STALE_WRITE_BACK
+from ...util.pygments.fingerprint import fingerprint
+from ...util.pygments.guard import HighlightLimitExceeded
+
+__all__ = (
+    "STATS",
+    "note_stale",
+    "queue_write_back",
+    "is_stale",
+    "refresh_value",
+    "heal_page",
+    "write_back_queued",
+    "write_back_on_request_finished",
+)
+
+logger = logging.getLogger(__name__)
+
+# Per-process counts: "rendered" stale blocks, pages "queued" for write-back, "healed" blocks and pages.
+STATS = Counter()
+
+_lock = threading.Lock()
+_queue: set[int] = set()
+
+
+def note_stale(context=None):
+    """Count a stale render, and queue the page being rendered for write-back (if enabled)."""
+    with _lock:
+        STATS["rendered"] += 1
+
+    if CODE_BLOCK_PYGMENTS_STALE_WRITE_BACK and context is not None:
+        page = context.get("page")
+
+        if page is not None and page.pk is not None:
+            queue_write_back(page.pk)
+
+
+def queue_write_back(page_pk):
+    with _lock:
+        if page_pk not in _queue:
+            _queue.add(page_pk)
+            STATS["queued"] += 1
+
+
+def is_stale(block, value) -> bool:
+    return not value.get("html") or value.get("fingerprint") != fingerprint(block.get_highlight_args(value))
+
+
+def refresh_value(block, value) -> bool:
+    """Re-highlight the html of a code block value in place if it's stale. Returns whether it was refreshed."""
+    args = block.get_highlight_args(value)
+    value_fingerprint = fingerprint(args)
+
+    if value.get("html") and value.get("fingerprint") == value_fingerprint:
+        return False
+
+    try:
+        value["html"] = block.highlight(*args)
+    except HighlightLimitExceeded:
+        # Transient (busy or crashed worker pool): left stale, to be retried.
+        return False
+
+    value["fingerprint"] = value_fingerprint
+    return True
+
+
+def heal_page(page, save=True) -> int:
+    """Refresh the stale code blocks of a (specific) page's live content. Returns the number of stale blocks.
+
+    Without ``save``, only count them.
+
+    Only the affected StreamFields are written, with a queryset update: the content is unchanged,
+    so no revision, signal or search index update is warranted. The page is re-read and written
+    under a row lock, and only if its latest revision is unchanged, so a concurrent publish is
+    never overwritten with older content.
+    """
+    from .content import iter_page_code_blocks
+
+    if not save:
+        return sum(is_stale(block, value) for _, block, value in iter_page_code_blocks(page))
+
+    model = type(page)
+
+    with transaction.atomic():
+        page = model.objects.select_for_update().get(pk=page.pk)
+        fields = set()
+        healed = 0
+
+        for field_name, block, value in iter_page_code_blocks(page):
+            if refresh_value(block, value):
+                fields.add(field_name)
+                healed += 1
+
+        if not fields:
+            return 0
+
+        updated = model.objects.filter(pk=page.pk, latest_revision_id=page.latest_revision_id).update(
+            **{name: getattr(page, name) for name in fields}
+        )
+
+    if not updated:
+        return 0
+
+    with _lock:
+        STATS["healed_blocks"] += healed
+        STATS["healed_pages"] += 1
+
+    return healed
+
+
+def write_back_queued():
+    """Heal the pages queued for write-back."""
+    from wagtail.models import Page
+
+    with _lock:
+        page_pks = list(_queue)
+        _queue.clear()
+
+    if not page_pks:
+        return
+
+    for page in Page.objects.filter(pk__in=page_pks).specific():
+        try:
+            heal_page(page)
+        except Exception:
+            logger.exception("Failed to write back code block html for page %s", page.pk)
+
+
+def write_back_on_request_finished():
+    """Heal queued pages after each response, outside of the request/response cycle's latency."""
+    def handler(**kwds):
+        write_back_queued()
+
+    request_finished.connect(handler, dispatch_uid=__name__, weak=False)
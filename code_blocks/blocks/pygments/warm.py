@@ -0,0 +1,183 @@
+"""Pre-warming of the highlight caches from page content.
+
+Highlighting runs in a process pool (or in process, when warming at startup) and results are
+stored in the shared highlight cache (``CODE_BLOCK_PYGMENTS_CACHE``), from which each server
+process fills its own LRU cache.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.signals import request_started
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from ...util.pygments import cache as highlight_cache
+from ...util.pygments.defaults import (
+    CODE_BLOCK_PYGMENTS_WARM_BUDGET,
+    CODE_BLOCK_PYGMENTS_WARM_PAGES,
+    CODE_BLOCK_PYGMENTS_WORKERS,
+)
+from ...util.pygments.guard import HighlightLimitExceeded
+from .block import PygmentsCodeBlock
+from .content import iter_pages_code_blocks
+
+__all__ = (
+    "collect_highlight_args",
+    "warm",
+    "warm_in_background",
+    "warm_on_first_request",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def collect_highlight_args(pages, revisions=False):
+    """Unique highlight() argument tuples for the code blocks of pages."""
+    args = {}
+
+    for page, field_name, block, value in iter_pages_code_blocks(pages, revisions=revisions):
+        try:
+            args.setdefault(block.get_highlight_args(value), None)
+        except ValueError as exc:
+            logger.warning("Skipping code block in %s.%s (page %s): %s", type(page).__name__, field_name, page.pk, exc)
+
+    return list(args)
+
+
+def _highlight_task(args):
+    return args, PygmentsCodeBlock.highlight_guarded(*args)
+
+
+def warm(pages, workers=CODE_BLOCK_PYGMENTS_WORKERS, budget=None, revisions=False, local=False):
+    """Highlight the code blocks of pages into the shared cache, within an optional time budget (seconds).
+
+    Uncached blocks are highlighted in a pool of ``workers`` processes, or in this process with
+    ``workers=0``. With ``local``, also fill this process's LRU cache. Returns a dict of counts:
+    ``total`` unique keys, ``cached`` (already present), ``warmed`` and ``skipped`` (out of budget).
+    """
+    started = time.monotonic()
+    deadline = started + budget if budget is not None else None
+    all_args = collect_highlight_args(pages, revisions=revisions)
+    stats = {"total": len(all_args), "cached": 0, "warmed": 0, "skipped": 0}
+
+    if highlight_cache.get_cache() is not None:
+        cached = highlight_cache.get_many(all_args)
+        pending = [args for args in all_args if args not in cached]
+        stats["cached"] = len(cached)
+
+        if workers:
+            stats["warmed"] = _warm_shared(pending, workers, deadline)
+        else:
+            stats["warmed"] = _warm_local(pending, deadline)
+
+        stats["skipped"] = len(pending) - stats["warmed"]
+
+    if local:
+        done = _warm_local(all_args, deadline)
+
+        if highlight_cache.get_cache() is None:
+            stats["warmed"] = done
+            stats["skipped"] = len(all_args) - done
+
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    return stats
+
+
+def _warm_local(pending, deadline):
+    """Highlight in this process, through the LRU cache and the shared cache (if configured)."""
+    done = 0
+
+    for args in pending:
+        if deadline is not None and time.monotonic() > deadline:
+            break
+
+        try:
+            PygmentsCodeBlock.highlight(*args)
+        except HighlightLimitExceeded as exc:
+            logger.warning("Failed to warm code block: %r", exc)
+            continue
+
+        done += 1
+
+    return done
+
+
+def _warm_shared(pending, workers, deadline):
+    if not pending:
+        return 0
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+
+    # Forked children must not share the parent's database connections.
+    connections.close_all()
+
+    warmed = 0
+    executor = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context)
+
+    try:
+        futures = {executor.submit(_highlight_task, args) for args in pending}
+
+        while futures:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, futures = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                break
+
+            results = {}
+
+            for future in done:
+                try:
+                    args, html = future.result()
+                except Exception as exc:
+                    logger.warning("Failed to warm code block: %r", exc)
+                    continue
+
+                results[args] = html
+
+            highlight_cache.set_many(results)
+            warmed += len(results)
+
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return warmed
+
+
+def warm_in_background(pages_callable=CODE_BLOCK_PYGMENTS_WARM_PAGES, budget=CODE_BLOCK_PYGMENTS_WARM_BUDGET):
+    """Warm the caches for the pages returned by ``pages_callable`` (or its dotted path) in a daemon thread.
+
+    Highlighting runs in the thread itself: forking a process pool from a serving process could
+    copy locks held by request threads (the process pool is left to warm_code_blocks).
+    """
+    if isinstance(pages_callable, str):
+        pages_callable = import_string(pages_callable)
+
+    def run():
+        try:
+            stats = warm(pages_callable(), workers=0, budget=budget, local=True)
+            logger.info("Warmed code block caches: %s", stats)
+        except Exception:
+            logger.exception("Failed to warm code block caches")
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=run, name="code-blocks-warm", daemon=True)
+    thread.start()
+    return thread
+
+
+def warm_on_first_request():
+    """Start background warming when this process serves its first request.
+
+    Deferring until then keeps queries out of app initialization and management commands.
+    """
+    def handler(**kwds):
+        request_started.disconnect(dispatch_uid=__name__)
+        warm_in_background()
+
+    request_started.connect(handler, dispatch_uid=__name__, weak=False)
@@ -0,0 +1,38 @@
+from django import forms
+from django.urls import reverse
+
+from ...util.pygments.registry import REGISTRIES, registry_version
+
+__all__ = "RegistryChoiceWidget",
+
+
+class RegistryChoiceWidget(forms.TextInput):
+    """Searchable picker for a shared registry (languages or styles).
+
+    Renders a plain text input bound to a page-wide <datalist>, which the admin script
+    fills from the registry endpoint the first time any picker for that registry is rendered.
+    """
+    URL_NAME = "code_blocks_pygments_registry"
+
+    def __init__(self, registry, attrs=None):
+        if registry not in REGISTRIES:
+            raise ValueError(f"Invalid registry: {registry}")
+
+        self.registry = registry
+
+        attrs = {
+            "list": f"code-blocks-registry-{registry}",
+            "autocomplete": "off",
+            "spellcheck": "false",
+            "data-code-blocks-registry": registry,
+            **(attrs or {}),
+        }
+
+        super().__init__(attrs)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["attrs"]["data-code-blocks-registry-url"] = (
+            f"{reverse(self.URL_NAME)}?v={registry_version()}"
+        )
+        return context
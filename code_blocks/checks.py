@@ -0,0 +1,46 @@
+from django.core.checks import Warning, register
+
+from .util.pygments import defaults
+
+
+@register()
+def check_font(app_configs, **kwds):
+    from .templatetags.code_blocks import font_paths
+
+    font = defaults.CODE_BLOCK_PYGMENTS_FONT
+
+    if font and font_paths(font) is None:
+        return [
+            Warning(
+                f"Code block font '{font}' has not been generated, so code blocks use the page's monospace font.",
+                hint=f"Run 'manage.py gen_code_block_font --name {font}' (into a project static directory), "
+                     f"or set CODE_BLOCK_PYGMENTS_FONT = None.",
+                id="code_blocks.W001",
+            )
+        ]
+
+    return []
+
+
+@register()
+def check_style_pairs(app_configs, **kwds):
+    from django.contrib.staticfiles import finders
+
+    from .templatetags.code_blocks import CSS_LINK_BASE
+
+    missing = [
+        f"{light}:{dark}" for light, dark in defaults.CODE_BLOCK_PYGMENTS_STYLE_PAIRS
+        if finders.find(f"{CSS_LINK_BASE}pygments/{light}--{dark}.css") is None
+    ]
+
+    if missing:
+        return [
+            Warning(
+                f"Code block style {'pairs' if len(missing) > 1 else 'pair'} {', '.join(missing)} "
+                f"{'have' if len(missing) > 1 else 'has'} no generated style sheet, so their code blocks are unstyled.",
+                hint=f"Run 'manage.py gen_pygments_style_css --pairs {' '.join(missing)}'.",
+                id="code_blocks.W002",
+            )
+        ]
+
+    return []
@@ -0,0 +1,94 @@
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+SAMPLE_CODE = """\
+# A short sample; first-hit cost is dominated by lexer setup, not input size.
+def main(argv):
+    for i, arg in enumerate(argv):
+        print(f"{i}: {arg!r}", "<&>")
+    return 0
+"""
+
+
+def _first_hit(languages, preload):
+    """Run in a fresh interpreter: time the first and second highlight of each language (ms)."""
+    import django
+    from django.conf import settings
+
+    # Before setup, so that ready() neither preloads the languages (this measures that) nor starts the guard pool.
+    settings.CODE_BLOCK_PYGMENTS_PRELOAD = False
+    settings.CODE_BLOCK_PYGMENTS_TIMEOUT = None
+    django.setup()
+
+    from code_blocks.blocks.pygments import PygmentsCodeBlock
+    from code_blocks.util.pygments.backends import preload as preload_backends
+
+    results = {}
+    started = time.perf_counter()
+
+    if preload:
+        preload_backends(languages)
+
+    preload_ms = (time.perf_counter() - started) * 1000
+
+    for language in languages:
+        timings = []
+
+        for _ in range(2):
+            started = time.perf_counter()
+            PygmentsCodeBlock._highlight(
+                language, "default", None, None, False, False, False, None, "", True, "", SAMPLE_CODE, ""
+            )
+            timings.append((time.perf_counter() - started) * 1000)
+
+        results[language] = timings
+
+    return preload_ms, results
+
+
+class Command(BaseCommand):
+    help = "Benchmark first-hit highlighting latency per language, with and without lexer preloading."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--languages', action="store", nargs="+", default=[],
+                            help="Languages to measure (default: CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES, or a sample).")
+        parser.add_argument('--runs', action="store", type=int, default=3,
+                            help="Fresh processes per mode; the median is reported.")
+
+    def handle(self, *args, **options):
+        from code_blocks.util.pygments import defaults
+
+        languages = (
+            options["languages"]
+            or defaults.CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES
+            or ["python", "javascript", "bash", "c", "html", "sql", "yaml", "rust"]
+        )
+
+        # Spawn, so that every run starts without compiled lexers (and not daemonic, unlike Pool workers).
+        context = multiprocessing.get_context("spawn")
+        runs = max(1, options["runs"])
+        modes = {}
+
+        with ProcessPoolExecutor(1, mp_context=context, max_tasks_per_child=1) as pool:
+            for preload in (False, True):
+                modes[preload] = [pool.submit(_first_hit, languages, preload).result() for _ in range(runs)]
+
+        def median(values):
+            values = sorted(values)
+            return values[len(values) // 2]
+
+        preload_ms = median([run[0] for run in modes[True]])
+        print(f"Preloading {len(languages)} languages took {preload_ms:.1f} ms (median of {runs} runs)", file=sys.stderr)
+
+        print(f"{'language':<20} {'cold first':>12} {'preloaded first':>16} {'warm':>10}")
+
+        for language in languages:
+            cold = median([run[1][language][0] for run in modes[False]])
+            warm = median([run[1][language][1] for run in modes[False]])
+            preloaded = median([run[1][language][0] for run in modes[True]])
+
+            print(f"{language:<20} {cold:>9.2f} ms {preloaded:>13.2f} ms {warm:>7.2f} ms")
@@ -0,0 +1,217 @@
+from io import BytesIO
+from pathlib import Path
+import re
+import sys
+import urllib.request
+import zipfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from code_blocks.util.pygments import defaults
+
+# Fonts are looked up under this static path (see the pygments_css template tag).
+FONTS_PATH = Path("code_blocks") / "fonts"
+
+HACK_URL = "https://github.com/source-foundry/Hack/releases/download/v3.003/Hack-v3.003-ttf.zip"
+
+# Latin, punctuation, currency, arrows, math operators and box drawing: what code mostly needs.
+UNICODE_RANGES = (
+    "U+0000-00FF,U+0131,U+0152-0153,U+02BB-02BC,U+02C6,U+02DA,U+02DC,U+2000-206F,U+2074,U+20AC,"
+    "U+2122,U+2190-21FF,U+2200-22FF,U+2500-259F,U+FEFF,U+FFFD"
+)
+
+# Generated (file name, weight, style) by variant.
+VARIANTS = {
+    "bolditalic": ("bolditalic.woff2", 700, "italic"),
+    "bold": ("bold.woff2", 700, "normal"),
+    "italic": ("italic.woff2", 400, "italic"),
+    "regular": ("regular.woff2", 400, "normal"),
+}
+
+# Variants in font file names, matched in order.
+VARIANT_PATTERNS = {
+    "bolditalic": re.compile(r"bold[-_ ]?(italic|oblique)"),
+    "bold": re.compile(r"bold"),
+    "italic": re.compile(r"italic|oblique"),
+    "regular": re.compile(r"regular|book|normal"),
+}
+
+FONT_SUFFIXES = (".ttf", ".otf", ".woff2", ".woff")
+
+FONT_FACE_FORMAT = """@font-face {{
+    font-family: "{family}";
+    font-style: {style};
+    font-weight: {weight};
+    font-display: swap;
+    src: url("{filename}") format("woff2");{unicode_range}
+}}
+"""
+
+
+class Command(BaseCommand):
+    help = "Generate (subset) or vendor the self-hosted code block font into static files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', action="store", type=str, default=defaults.CODE_BLOCK_PYGMENTS_FONT or "hack",
+                            help="Font directory name, as in CODE_BLOCK_PYGMENTS_FONT (default: the setting).")
+        parser.add_argument('--family', action="store", type=str,
+                            help="CSS font family name (default: Hack for hack, else the name).")
+        parser.add_argument('--source', action="store", type=str,
+                            help="Directory, zip file or zip URL with the font files (default: the Hack release).")
+        parser.add_argument('--unicodes', action="store", type=str, default=UNICODE_RANGES,
+                            help="Unicode ranges to keep when subsetting.")
+        parser.add_argument('--no-subset', action="store_true",
+                            help="Copy WOFF2 files as they are (doesn't require fontTools).")
+        parser.add_argument('--dir', action="store", type=str,
+                            help="Output base dir, served as static code_blocks/fonts/ "
+                                 "(default: code_blocks/fonts/ in the first STATICFILES_DIRS entry).")
+
+    def handle(self, *args, **options):
+        name = options["name"]
+        family = options["family"] or ("Hack" if name == "hack" else name)
+        source = options["source"]
+        subset = not options["no_subset"]
+
+        if not source:
+            if name != "hack":
+                raise CommandError("--source is required for fonts other than hack.")
+
+            source = HACK_URL
+
+        if subset:
+            try:
+                import fontTools.subset  # noqa: F401
+                import brotli  # noqa: F401
+            except ImportError:
+                raise CommandError(
+                    "Subsetting requires fontTools and brotli (pip install fonttools brotli), "
+                    "or pass --no-subset to copy WOFF2 files as they are."
+                )
+
+        fonts_dir = Path(options["dir"]) if options["dir"] else self.default_fonts_dir()
+        fonts = self.find_fonts(self.read_source(source), woff2_only=not subset)
+
+        if "regular" not in fonts:
+            raise CommandError(f"No regular font file found in {source}.")
+
+        font_dir = fonts_dir / name
+        font_dir.mkdir(parents=True, exist_ok=True)
+
+        faces = []
+
+        for variant, (filename, weight, style) in VARIANTS.items():
+            if variant not in fonts:
+                continue
+
+            source_name, data = fonts[variant]
+
+            if subset:
+                try:
+                    data = subset_font(data, options["unicodes"])
+                except Exception as exc:
+                    raise CommandError(f"Failed to subset {source_name}: {exc}")
+
+            print(f"Writing {font_dir / filename} ({len(data) // 1024} KiB, from {source_name})", file=sys.stderr)
+            (font_dir / filename).write_bytes(data)
+
+            faces.append(font_face_css(family, filename, weight, style, options["unicodes"] if subset else None))
+
+        # Switch the code block font (see pygments_code_block.css) to the generated family.
+        css = "\n".join(faces) + f'\n.block-code {{\n    --font-family-mono: "{family}", monospace;\n}}\n'
+
+        print(f"Writing {font_dir / 'font.css'}", file=sys.stderr)
+        (font_dir / "font.css").write_text(css)
+
+        if defaults.CODE_BLOCK_PYGMENTS_FONT != name:
+            print(f"Set CODE_BLOCK_PYGMENTS_FONT = {name!r} to use the font.", file=sys.stderr)
+
+    @staticmethod
+    def default_fonts_dir():
+        """code_blocks/fonts/ in the first unprefixed STATICFILES_DIRS entry (project static files)."""
+        for entry in getattr(settings, "STATICFILES_DIRS", ()):
+            if isinstance(entry, str | Path):
+                return Path(entry) / FONTS_PATH
+
+        raise CommandError(
+            "No STATICFILES_DIRS entry to write the font to: add a project static directory, "
+            "or pass --dir (a directory served as static code_blocks/fonts/)."
+        )
+
+    @staticmethod
+    def read_source(source):
+        """Yield (file name, data) for the files of a directory, zip file or zip URL."""
+        if source.startswith(("http://", "https://")):
+            print(f"Downloading {source}", file=sys.stderr)
+
+            try:
+                with urllib.request.urlopen(source) as response:
+                    source = BytesIO(response.read())
+            except OSError as exc:
+                raise CommandError(f"Failed to download {source}: {exc}")
+
+        elif Path(source).is_dir():
+            for path in sorted(Path(source).rglob("*")):
+                if path.suffix.lower() in FONT_SUFFIXES:
+                    yield path.name, path.read_bytes()
+            return
+
+        elif not zipfile.is_zipfile(source):
+            raise CommandError(f"Not a directory, zip file or URL: {source}")
+
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if Path(info.filename).suffix.lower() in FONT_SUFFIXES:
+                    yield Path(info.filename).name, archive.read(info)
+
+    @staticmethod
+    def find_fonts(files, woff2_only=False):
+        """Map variants to (file name, data), preferring the first suffix in FONT_SUFFIXES."""
+        found = {}
+
+        for filename, data in files:
+            lower = filename.lower()
+            suffix = Path(lower).suffix
+
+            if "subset" in lower or (woff2_only and suffix != ".woff2"):
+                continue
+
+            variant = next((variant for variant, pattern in VARIANT_PATTERNS.items() if pattern.search(lower)), None)
+
+            if variant is None:
+                continue
+
+            rank = FONT_SUFFIXES.index(suffix)
+
+            if variant not in found or rank < found[variant][0]:
+                found[variant] = rank, filename, data
+
+        return {variant: (filename, data) for variant, (_, filename, data) in found.items()}
+
+
+def subset_font(data, unicodes):
+    from fontTools import subset
+
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]
+
+    font = subset.load_font(BytesIO(data), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=subset.parse_unicodes(unicodes))
+    subsetter.subset(font)
+
+    output = BytesIO()
+    subset.save_font(font, output, options)
+    return output.getvalue()
+
+
+def font_face_css(family, filename, weight, style, unicodes=None):
+    unicode_range = ""
+
+    if unicodes:
+        unicode_range = "\n    unicode-range: " + ", ".join(unicodes.replace(",", " ").split()) + ";"
+
+    return FONT_FACE_FORMAT.format(
+        family=family, style=style, weight=weight, filename=filename, unicode_range=unicode_range,
+    )
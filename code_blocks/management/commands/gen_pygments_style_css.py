@@ -1,16 +1,25 @@
 from pathlib import Path
+import re
 import sys
 
 from django.core.management.base import BaseCommand
 
-from pygments.cmdline import main as pygments_main
 from pygments.formatters import HtmlFormatter
 
 import code_blocks
 from code_blocks.util.pygments import defaults
+from code_blocks.util.pygments.backends import get_default_backend
 
 CSS_DIR = Path(code_blocks.__path__[0]) / "static" / "code_blocks" / "css" / "pygments"
 
+# Token properties that styles set, reset in the dark rules of pair style sheets, so that
+# nothing the dark style leaves unset carries over from the light style.
+TOKEN_RESET = (
+    "color: inherit; background-color: transparent; border: none; "
+    "font-weight: normal; font-style: normal; text-decoration: none;"
+)
+
+
 class Command(BaseCommand):
     help = "Generate pygments style css files."
 
@@ -21,6 +30,12 @@ class Command(BaseCommand):
         parser.add_argument('--list', action="store_true", help="List available styles.")
         parser.add_argument('--styles', action="store", nargs="+", default=[],
                             help="Generate selected styles.")
+        parser.add_argument('--pairs', action="store", nargs="+", default=[],
+                            help="Generate combined light/dark style sheets, as light:dark "
+                                 "(default: CODE_BLOCK_PYGMENTS_STYLE_PAIRS).")
+        parser.add_argument('--theme-attribute', action="store", type=str,
+                            default=defaults.CODE_BLOCK_PYGMENTS_THEME_ATTRIBUTE,
+                            help="Root attribute that forces a theme in pair style sheets, e.g. data-theme.")
 
     def handle(self, *args, **options):
         if options["list"]:
@@ -45,7 +60,7 @@ class Command(BaseCommand):
                     print(f"Removing {file}", file=sys.stderr)
                     file.unlink()
 
-        styles = options["styles"] or defaults.CODE_BLOCK_PYGMENTS_STYLES
+        styles = options["styles"] or (defaults.CODE_BLOCK_PYGMENTS_STYLES if not options["pairs"] else [])
 
         for style_name in styles:
             if style_name not in defaults.CODE_BLOCK_PYGMENTS_STYLES:
@@ -59,22 +74,82 @@ class Command(BaseCommand):
                 print(f"Skipping {style_name} (already exists)", file=sys.stderr)
                 continue
 
-            with css_file.open("w") as file:
-                sys.stdout = file
+            css = get_default_backend().style_css(
+                style_name, f".{defaults.CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS}-{style_name}"
+            )
+
+            css_file.write_text(css + "\n")
+
+        if options["pairs"]:
+            pairs = [tuple(pair.split(":", 1)) for pair in options["pairs"]]
+        elif not options["styles"]:
+            pairs = defaults.CODE_BLOCK_PYGMENTS_STYLE_PAIRS
+        else:
+            pairs = []
+
+        for pair in pairs:
+            if len(pair) != 2 or not all(style in defaults.CODE_BLOCK_PYGMENTS_STYLES for style in pair):
+                print(f"Invalid style pair '{':'.join(pair)}'", file=sys.stderr)
+                continue
+
+            light, dark = pair
+            css_file = css_dir / f"{light}--{dark}.css"
+
+            if not replace and css_file.exists():
+                print(f"Skipping {light}:{dark} (already exists)", file=sys.stderr)
+                continue
+
+            css_file.write_text(pair_css(light, dark, options["theme_attribute"]) + "\n")
+
+
+def pair_css(light, dark, theme_attribute=None):
+    """Combined style sheet for a light/dark pair, switched by prefers-color-scheme.
+
+    With theme_attribute (e.g. data-theme), [data-theme=dark] on the root element forces the
+    dark style, and [data-theme=light] keeps the light style when the system prefers dark.
+    """
+    backend = get_default_backend()
+    selector = f".{defaults.CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS}-{light}--{dark}"
+    media_selector = selector
+
+    if theme_attribute:
+        media_selector = f":root:not([{theme_attribute}=light]) {selector}"
+
+    light_css = backend.style_css(light, selector)
+    tokens = token_classes(light_css, selector)
+
+    def dark_rules(dark_selector):
+        return token_reset_css(dark_selector, tokens) + "\n" + backend.style_css(dark, dark_selector)
+
+    parts = [
+        f"/* {light} */",
+        light_css,
+        f"/* {dark} */",
+        "@media (prefers-color-scheme: dark) {",
+        "\n".join(f"  {line}" for line in dark_rules(media_selector).splitlines()),
+        "}",
+    ]
+
+    if theme_attribute:
+        parts.append(dark_rules(f"[{theme_attribute}=dark] {selector}"))
+
+    return "\n".join(parts)
+
+
+def token_classes(css, selector):
+    """Token classes (e.g. ``.k``) styled in css scoped under selector, in order."""
+    pattern = re.compile(rf"^{re.escape(selector)} (\.[\w-]+) {{", re.MULTILINE)
+    return list(dict.fromkeys(pattern.findall(css)))
+
 
-                args = [
-                    "pygmentize",
-                    "-S", style_name,
-                    "-f", "html",
-                    "-a", f".{defaults.CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS}-{style_name}"
-                ]
+def token_reset_css(selector, tokens):
+    if not tokens:
+        return ""
 
-                error = pygments_main(args)
+    return ",\n".join(f"{selector} {token}" for token in tokens) + f" {{ {TOKEN_RESET} }}"
 
-                if error:
-                    return error
 
-# Hooks HTML formatter output for pygmentize.
+# Hooks HTML formatter output for style CSS generation.
 #
 
 
@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from wagtail.models import Page
+
+from code_blocks.blocks.pygments.stale import heal_page
+
+
+class Command(BaseCommand):
+    help = "Count (and optionally rewrite) code blocks whose stored html is stale."
+
+    def add_arguments(self, parser):
+        parser.add_argument('pages', nargs="*", type=int, help="Page IDs to check (default: all pages).")
+        parser.add_argument('--queryset', action="store", type=str,
+                            help="Dotted path to a callable returning pages.")
+        parser.add_argument('--write', action="store_true", help="Rewrite the stale html.")
+
+    def handle(self, *args, **options):
+        if options["queryset"]:
+            pages = import_string(options["queryset"])()
+        elif options["pages"]:
+            pages = Page.objects.filter(pk__in=options["pages"])
+        else:
+            pages = Page.objects.all()
+
+        stale_blocks = 0
+        stale_pages = 0
+        failed = 0
+        checked = 0
+
+        for page in pages:
+            page = page.specific
+            checked += 1
+
+            try:
+                healed = heal_page(page, save=options["write"])
+            except ValueError as exc:
+                print(f"Skipping page {page.pk}: {exc}", file=sys.stderr)
+                failed += 1
+                continue
+
+            if healed:
+                stale_blocks += healed
+                stale_pages += 1
+
+        action = "Rewrote" if options["write"] else "Found"
+
+        print(
+            f"{action} {stale_blocks} stale code blocks on {stale_pages} of {checked} pages"
+            + (f" ({failed} skipped)." if failed else ".")
+        )
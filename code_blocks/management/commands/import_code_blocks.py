@@ -0,0 +1,113 @@
+import sys
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from wagtail.fields import StreamField
+from wagtail.models import Page
+
+from code_blocks.blocks.pygments.block import PygmentsCodeBlock
+from code_blocks.blocks.pygments.importer import import_files, iter_source_files, page_writer
+from code_blocks.util.pygments import defaults
+
+
+class Command(BaseCommand):
+    help = "Import a directory or zip/tar archive of source files as code blocks on pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Directory, or zip or tar archive.")
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--parent', action="store", type=int,
+                            help="Parent page ID: creates a child page per directory group.")
+        target.add_argument('--page', action="store", type=int, help="Page ID to append all code blocks to.")
+        parser.add_argument('--page-type', action="store", type=str,
+                            help="Page model for created pages (app_label.ModelName), required with --parent.")
+        parser.add_argument('--field', action="store", type=str,
+                            help="StreamField name (default: the first with a code block).")
+        parser.add_argument('--block', action="store", type=str,
+                            help="Code block name in the StreamField (default: the first code block).")
+        parser.add_argument('--depth', action="store", type=int, default=1,
+                            help="Group files into pages by this many leading directories (default: 1).")
+        parser.add_argument('--include', action="append", default=[], help="Only import matching file names (glob).")
+        parser.add_argument('--exclude', action="append", default=[], help="Skip matching file names (glob).")
+        parser.add_argument('--fallback', action="store", type=str, default="text",
+                            help="Language for unrecognized file names, or 'none' to skip them (default: text).")
+        parser.add_argument('--max-bytes', action="store", type=int, default=1024 * 1024,
+                            help="Skip larger files (default: 1 MiB).")
+        parser.add_argument('--no-headings', action="store_true", help="Don't set file paths as headings.")
+        parser.add_argument('--live', action="store_true", help="Create live pages instead of drafts.")
+        parser.add_argument('--workers', action="store", type=int, default=defaults.CODE_BLOCK_PYGMENTS_WORKERS,
+                            help="Number of highlighting processes.")
+        parser.add_argument('--batch', action="store", type=int, default=50,
+                            help="Pages written per transaction (default: 50).")
+
+    def handle(self, *args, **options):
+        if options["page"]:
+            page = Page.objects.filter(pk=options["page"]).first()
+
+            if page is None:
+                raise CommandError(f"No page with ID {options['page']}.")
+
+            page = page.specific
+            page_model, parent = type(page), None
+        else:
+            page = None
+            parent = Page.objects.filter(pk=options["parent"]).first()
+
+            if parent is None:
+                raise CommandError(f"No page with ID {options['parent']}.")
+
+            if not options["page_type"]:
+                raise CommandError("--page-type is required with --parent.")
+
+            try:
+                page_model = apps.get_model(options["page_type"])
+            except (LookupError, ValueError) as exc:
+                raise CommandError(str(exc))
+
+        field_name, block_name, block = self.get_block(page_model, options["field"], options["block"])
+
+        fallback = None if options["fallback"] == "none" else options["fallback"]
+
+        if fallback is not None and fallback not in defaults.CODE_BLOCK_PYGMENTS_LANGUAGES:
+            raise CommandError(f"Fallback language {fallback} is not in CODE_BLOCK_PYGMENTS_LANGUAGES.")
+
+        try:
+            files = iter_source_files(options["source"], include=options["include"], exclude=options["exclude"])
+            write = page_writer(field_name, block_name, page=page, parent=parent, page_model=page_model,
+                                live=options["live"])
+
+            print(f"Importing {options['source']} into {page_model.__name__}.{field_name}...", file=sys.stderr)
+
+            stats = import_files(
+                files, block, write,
+                depth=options["depth"],
+                fallback=fallback,
+                max_bytes=options["max_bytes"],
+                headings=not options["no_headings"],
+                workers=options["workers"],
+                batch=options["batch"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        languages = ", ".join(f"{language} {count}" for language, count in stats["languages"].most_common())
+
+        print(
+            f"Imported {stats['imported']} of {stats['files']} files into {stats['pages']} pages in {stats['seconds']}s"
+            f" ({stats['skipped']} skipped, {stats['failed']} failed)."
+        )
+
+        if languages:
+            print(f"Languages: {languages}")
+
+    @staticmethod
+    def get_block(page_model, field_name=None, block_name=None):
+        for field in page_model._meta.get_fields():
+            if not isinstance(field, StreamField) or (field_name and field.name != field_name):
+                continue
+
+            for name, block in field.stream_block.child_blocks.items():
+                if isinstance(block, PygmentsCodeBlock) and (not block_name or name == block_name):
+                    return field.name, name, block
+
+        raise CommandError(f"No matching code block in the StreamFields of {page_model.__name__}.")
@@ -0,0 +1,122 @@
+import json
+import pstats
+import sys
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from code_blocks.blocks.pygments.profiling import profile
+from code_blocks.util.pygments import defaults
+
+
+def kib(size):
+    return f"{size / 1024:.1f}"
+
+
+class Command(BaseCommand):
+    help = "Profile highlighting of all code blocks in the database, reporting costs by language."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--live-only', action="store_true", help="Skip latest draft revisions.")
+        parser.add_argument('--workers', action="store", type=int, default=defaults.CODE_BLOCK_PYGMENTS_WORKERS,
+                            help="Number of highlighting processes.")
+        parser.add_argument('--slowest', action="store", type=int, default=10,
+                            help="Number of slowest blocks to list (default: 10).")
+        parser.add_argument('--json', action="store", type=str, help="Also write the report as JSON to this file.")
+        parser.add_argument('--profile', action="store", type=str,
+                            help="Run cProfile in the workers (inflating the timings), "
+                                 "and write the merged stats to this file.")
+        parser.add_argument('--profile-top', action="store", type=int, default=20,
+                            help="Number of functions to print from the profile, by cumulative time (default: 20).")
+
+    def handle(self, *args, **options):
+        print("Profiling code blocks...", file=sys.stderr)
+
+        with tempfile.TemporaryDirectory() as profile_dir:
+            report = profile(
+                revisions=not options["live_only"],
+                workers=options["workers"],
+                slowest=options["slowest"],
+                profile_dir=profile_dir if options["profile"] else None,
+            )
+
+            if options["profile"]:
+                files = [str(path) for path in Path(profile_dir).glob("*.prof")]
+
+                if files:
+                    stats = pstats.Stats(*files, stream=sys.stdout)
+                    stats.dump_stats(options["profile"])
+                    stats.sort_stats("cumulative").print_stats(options["profile_top"])
+                    print(f"Wrote {options['profile']}", file=sys.stderr)
+
+        self.print_report(report)
+
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump(report, file, indent=2)
+
+            print(f"Wrote {options['json']}", file=sys.stderr)
+
+    @staticmethod
+    def print_report(report):
+        print(
+            f"{'language':<16} {'blocks':>7} {'src KiB':>9} {'html KiB':>9} {'fresh KiB':>9}"
+            f" {'lex p50':>8} {'lex p99':>8} {'lex max':>8} {'fmt p50':>8} {'fmt p99':>8} {'fmt max':>8}"
+        )
+
+        for language, stats in report["languages"].items():
+            lex, fmt = stats["lex"], stats["format"]
+
+            print(
+                f"{language:<16} {stats['blocks']:>7} {kib(stats['source_bytes']):>9} {kib(stats['html_bytes']):>9}"
+                f" {kib(stats['fresh_html_bytes']):>9}"
+                f" {lex['p50_ms']:>8.2f} {lex['p99_ms']:>8.2f} {lex['max_ms']:>8.2f}"
+                f" {fmt['p50_ms']:>8.2f} {fmt['p99_ms']:>8.2f} {fmt['max_ms']:>8.2f}"
+            )
+
+        lex, fmt = report["lex"], report["format"]
+
+        print(
+            f"{'(all)':<16} {report['blocks']:>7} {kib(report['source_bytes']):>9} {kib(report['html_bytes']):>9}"
+            f" {kib(report['fresh_html_bytes']):>9}"
+            f" {lex['p50_ms']:>8.2f} {lex['p99_ms']:>8.2f} {lex['max_ms']:>8.2f}"
+            f" {fmt['p50_ms']:>8.2f} {fmt['p99_ms']:>8.2f} {fmt['max_ms']:>8.2f}"
+        )
+        print("(times in ms)")
+        print()
+
+        print(
+            f"Blocks: {report['blocks']} ({report['revision_blocks']} in draft revisions),"
+            f" auto: {report['auto']}, linenos: {report['linenos']}, oversized: {report['oversized']},"
+            f" skipped: {report['skipped']}, errors: {report['errors']}, timed out: {report['timed_out']}"
+        )
+        print(
+            f"Unique sources: {report['unique_sources']} (duplicate ratio {report['duplicate_ratio']:.1%}),"
+            f" preparation (detection, formatters) total: {report['prepare']['total_ms']:.1f} ms,"
+            f" took {report['seconds']}s"
+        )
+
+        if report["slowest"]:
+            print()
+            print(f"{'total ms':>9} {'lex ms':>8} {'fmt ms':>8} {'src KiB':>8} {'language':<12} page")
+
+            for block in report["slowest"]:
+                link = block["admin_url"] or block["url"] or f"{block['model']} {block['pk']}"
+                draft = " (draft)" if block["revision"] else ""
+
+                print(
+                    f"{block['total_ms']:>9.2f} {block['lex_ms']:>8.2f} {block['format_ms']:>8.2f}"
+                    f" {kib(block['source_bytes']):>8} {block['language']:<12} {block['title']}{draft} {link}"
+                )
+
+        if report["timed_out_blocks"]:
+            print()
+            print(f"Timed out (over {defaults.CODE_BLOCK_PYGMENTS_TIMEOUT}s):")
+            print(f"{'src KiB':>8} {'language':<12} page")
+
+            for block in report["timed_out_blocks"]:
+                link = block["admin_url"] or block["url"] or f"{block['model']} {block['pk']}"
+                draft = " (draft)" if block["revision"] else ""
+
+                print(f"{kib(block['source_bytes']):>8} {block['language']:<12} {block['title']}{draft} {link}")
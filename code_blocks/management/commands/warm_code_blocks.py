@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+from wagtail.models import Page
+
+from code_blocks.blocks.pygments.warm import warm
+from code_blocks.util.pygments import defaults
+from code_blocks.util.pygments.cache import get_cache
+
+
+class Command(BaseCommand):
+    help = "Pre-warm the shared code block highlight cache from page content."
+
+    def add_arguments(self, parser):
+        parser.add_argument('pages', nargs="*", type=int, help="Page IDs to warm (default: recently published pages).")
+        parser.add_argument('--queryset', action="store", type=str,
+                            help="Dotted path to a callable returning pages, e.g. the most viewed.")
+        parser.add_argument('--limit', action="store", type=int, default=100,
+                            help="Maximum number of pages (default: 100).")
+        parser.add_argument('--revisions', action="store_true", help="Include latest draft revisions (for previews).")
+        parser.add_argument('--workers', action="store", type=int, default=defaults.CODE_BLOCK_PYGMENTS_WORKERS,
+                            help="Number of highlighting processes.")
+        parser.add_argument('--budget', action="store", type=float, default=None,
+                            help="Time budget in seconds.")
+
+    def handle(self, *args, **options):
+        if get_cache() is None:
+            raise CommandError("CODE_BLOCK_PYGMENTS_CACHE is not set, so there is no shared cache to warm.")
+
+        limit = options["limit"]
+
+        if options["queryset"]:
+            pages = import_string(options["queryset"])()
+        elif options["pages"]:
+            pages = Page.objects.filter(pk__in=options["pages"])
+        else:
+            pages = Page.objects.live().order_by("-last_published_at")
+
+        pages = list(pages[:limit]) if limit else list(pages)
+
+        print(f"Warming code blocks from {len(pages)} pages...", file=sys.stderr)
+
+        stats = warm(pages, workers=options["workers"], budget=options["budget"], revisions=options["revisions"])
+
+        print(
+            f"Warmed {stats['warmed']} of {stats['total']} keys in {stats['seconds']}s"
+            f" ({stats['cached']} already cached, {stats['skipped']} skipped over budget)."
+        )
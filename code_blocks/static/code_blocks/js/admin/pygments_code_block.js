@@ -1,3 +1,47 @@
+const pygmentsRegistryRequests = {};
+
+function loadPygmentsRegistry(url) {
+    if (!pygmentsRegistryRequests[url]) {
+        pygmentsRegistryRequests[url] = fetch(url, {credentials: 'same-origin'}).then((response) => {
+            if (!response.ok) {
+                delete pygmentsRegistryRequests[url];
+                throw new Error(`Failed to load code block registry: ${response.status}`);
+            }
+
+            return response.json();
+        });
+    }
+
+    return pygmentsRegistryRequests[url];
+}
+
+function attachPygmentsRegistry(input) {
+    const registry = input.dataset.codeBlocksRegistry;
+    const listId = input.getAttribute('list');
+
+    if (!registry || !listId || document.getElementById(listId)) {
+        return;
+    }
+
+    loadPygmentsRegistry(input.dataset.codeBlocksRegistryUrl).then((data) => {
+        if (document.getElementById(listId)) {
+            return;
+        }
+
+        const datalist = document.createElement('datalist');
+        datalist.id = listId;
+
+        for (const [value, label] of data[registry] || []) {
+            const option = document.createElement('option');
+            option.value = value;
+            option.label = label;
+            datalist.appendChild(option);
+        }
+
+        document.body.appendChild(datalist);
+    }).catch((error) => console.error(error));
+}
+
 class PygmentsCodeBlockDefinition extends window.wagtailStreamField.blocks
     .StructBlockDefinition {
     render(placeholder, prefix, initialState, initialError) {
@@ -8,6 +52,14 @@ class PygmentsCodeBlockDefinition extends window.wagtailStreamField.blocks
             initialError,
         );
 
+        for (const field of ['language', 'style', 'style_dark']) {
+            const input = document.getElementById(prefix + '-' + field);
+
+            if (input) {
+                attachPygmentsRegistry(input);
+            }
+        }
+
         const showCornerTextField = document.getElementById(prefix + '-show_corner_text');
         const cornerTextField = document.getElementById(prefix + '-corner_text');
 
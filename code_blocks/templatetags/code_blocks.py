@@ -1,4 +1,7 @@
+from functools import lru_cache
+
 from django import template
+from django.contrib.staticfiles import finders
 from django.templatetags.static import static
 from django.utils.safestring import mark_safe
 
@@ -7,6 +10,8 @@ from ..util.pygments import defaults as pygments_defaults
 CSS_LINK_BASE = "code_blocks/css/"
 CSS_LINK_FORMAT = """<link rel="stylesheet"{id} href="{url}">"""
 JS_BASE = "code_blocks/js/"
+FONT_BASE = "code_blocks/fonts/"
+FONT_PRELOAD_FORMAT = """<link rel="preload" href="{url}" as="font" type="font/woff2" crossorigin>"""
 
 register = template.Library()
 
@@ -27,11 +32,35 @@ def css_link(path):
     return CSS_LINK_FORMAT.format(url=path, id=id_attr)
 
 
+@lru_cache
+def font_paths(font):
+    """Static paths of a generated font's style sheet and regular face (or None), or None if not generated."""
+    css_path = f"{FONT_BASE}{font}/font.css"
+
+    if finders.find(css_path) is None:
+        return None
+
+    regular_path = f"{FONT_BASE}{font}/regular.woff2"
+    return css_path, regular_path if finders.find(regular_path) else None
+
+
+def font_links(font, preload):
+    """Preload links (first) and the style sheet link of a generated font."""
+    paths = font_paths(font) if font else None
+
+    if paths is None:
+        return [], []
+
+    css_path, regular_path = paths
+    preload_links = [FONT_PRELOAD_FORMAT.format(url=static(regular_path))] if preload and regular_path else []
+
+    return preload_links, [CSS_LINK_FORMAT.format(url=static(css_path), id=' id="code-blocks-font"')]
+
+
 @register.simple_tag
-def pygments_css(styles="none"):
+def pygments_css(styles="none", pairs="none", font_preload=None):
     links = [
         "pygments_code_block.css",
-        "https://cdnjs.cloudflare.com/ajax/libs/hack-font/3.3.0/web/hack.min.css",
     ]
 
     if styles == "all":
@@ -41,7 +70,7 @@ def pygments_css(styles="none"):
         styles = []
 
     else:
-        styles = map(str.split, styles.split(","))
+        styles = map(str.strip, styles.split(","))
 
     for style in styles:
         if style not in pygments_defaults.CODE_BLOCK_PYGMENTS_STYLES:
@@ -49,8 +78,32 @@ def pygments_css(styles="none"):
 
         links.append((f"pygments/{style}.css", f"pygments-style-{style}"))
 
+    # Combined light/dark style sheets, as "light:dark,..." or "all" configured pairs.
+    if pairs == "all":
+        pairs = pygments_defaults.CODE_BLOCK_PYGMENTS_STYLE_PAIRS
+
+    elif pairs == "none":
+        pairs = []
+
+    else:
+        pairs = [tuple(map(str.strip, pair.split(":", 1))) for pair in pairs.split(",")]
+
+    for pair in pairs:
+        if pair not in pygments_defaults.CODE_BLOCK_PYGMENTS_STYLE_PAIRS:
+            raise ValueError(f"Invalid pygments code block style pair '{':'.join(pair)}'")
+
+        light, dark = pair
+        links.append((f"pygments/{light}--{dark}.css", f"pygments-style-{light}--{dark}"))
+
+    if font_preload is None:
+        font_preload = pygments_defaults.CODE_BLOCK_PYGMENTS_FONT_PRELOAD
+
+    # Self-hosted font (see gen_code_block_font), after the base style sheet it overrides.
+    preload_links, font_css_links = font_links(pygments_defaults.CODE_BLOCK_PYGMENTS_FONT, font_preload)
+    base_link, *style_links = map(css_link, links)
+
     # noinspection DjangoSafeString
-    return mark_safe("\n".join(map(css_link, links)))
+    return mark_safe("\n".join([*preload_links, base_link, *font_css_links, *style_links]))
 
 
 @register.simple_tag
@@ -0,0 +1,67 @@
+"""Shared highlight cache, keyed by the full set of highlight arguments.
+
+Sits behind the per-process LRU cache on ``PygmentsCodeBlock.highlight`` so that all workers
+(and the ``warm_code_blocks`` command) share highlighted output. Disabled unless
+``CODE_BLOCK_PYGMENTS_CACHE`` names a configured cache.
+"""
+from django.core.cache import caches
+
+from .defaults import (
+    CODE_BLOCK_PYGMENTS_CACHE,
+    CODE_BLOCK_PYGMENTS_CACHE_TIMEOUT,
+)
+from .fingerprint import digest
+
+__all__ = (
+    "get_cache",
+    "make_key",
+    "get_or_set",
+    "get_many",
+    "set_many",
+)
+
+CACHE_KEY_PREFIX = "code_blocks:pygments:"
+
+
+def get_cache():
+    if CODE_BLOCK_PYGMENTS_CACHE is None:
+        return None
+
+    return caches[CODE_BLOCK_PYGMENTS_CACHE]
+
+
+def make_key(args: tuple) -> str:
+    return CACHE_KEY_PREFIX + digest(args)
+
+
+def get_or_set(args: tuple, func):
+    cache = get_cache()
+
+    if cache is None:
+        return func(*args)
+
+    key = make_key(args)
+    html = cache.get(key)
+
+    if html is None:
+        html = func(*args)
+        cache.set(key, html, CODE_BLOCK_PYGMENTS_CACHE_TIMEOUT)
+
+    return html
+
+
+def get_many(args_list) -> dict[tuple, str]:
+    cache = get_cache()
+
+    if cache is None:
+        return {}
+
+    keys = {make_key(args): args for args in args_list}
+    return {keys[key]: html for key, html in cache.get_many(keys).items()}
+
+
+def set_many(results: dict[tuple, str]):
+    cache = get_cache()
+
+    if cache is not None and results:
+        cache.set_many({make_key(args): html for args, html in results.items()}, CODE_BLOCK_PYGMENTS_CACHE_TIMEOUT)
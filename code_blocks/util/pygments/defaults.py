@@ -5,9 +5,30 @@ from pygments import lexers, styles
 __all__ = (
     "CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES",
     "CODE_BLOCK_PYGMENTS_LANGUAGES",
+    "CODE_BLOCK_PYGMENTS_LANGUAGE_KEYS",
     "CODE_BLOCK_PYGMENTS_STYLES",
+    "CODE_BLOCK_PYGMENTS_STYLE_KEYS",
     "CODE_BLOCK_PYGMENTS_LINENO_CHOICES",
     "CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS",
+    "CODE_BLOCK_PYGMENTS_MAX_BYTES",
+    "CODE_BLOCK_PYGMENTS_MAX_LINES",
+    "CODE_BLOCK_PYGMENTS_TIMEOUT",
+    "CODE_BLOCK_PYGMENTS_WORKERS",
+    "CODE_BLOCK_PYGMENTS_CACHE",
+    "CODE_BLOCK_PYGMENTS_CACHE_TIMEOUT",
+    "CODE_BLOCK_PYGMENTS_WARM_PAGES",
+    "CODE_BLOCK_PYGMENTS_WARM_BUDGET",
+    "CODE_BLOCK_PYGMENTS_BACKEND",
+    "CODE_BLOCK_PYGMENTS_LANGUAGE_BACKENDS",
+    "CODE_BLOCK_PYGMENTS_PRELOAD",
+    "CODE_BLOCK_PYGMENTS_FORMATTER_CACHE_SIZE",
+    "CODE_BLOCK_PYGMENTS_STYLE_PAIRS",
+    "CODE_BLOCK_PYGMENTS_THEME_ATTRIBUTE",
+    "CODE_BLOCK_PYGMENTS_STALE_CHECK",
+    "CODE_BLOCK_PYGMENTS_STALE_CHECK_MISSING",
+    "CODE_BLOCK_PYGMENTS_STALE_WRITE_BACK",
+    "CODE_BLOCK_PYGMENTS_FONT",
+    "CODE_BLOCK_PYGMENTS_FONT_PRELOAD",
 )
 
 CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES: list[str] = list(getattr(settings, 'CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES', ['auto']))
@@ -19,6 +40,49 @@ CODE_BLOCK_PYGMENTS_STYLE_CHOICES: dict[str, str] = dict(getattr(settings, 'CODE
 
 CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS = getattr(settings, 'CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS', 'highlight')
 
+# Guarded highlighting: inputs over these limits, or taking longer than the timeout (in seconds),
+# are rendered as escaped plain text. None disables a limit; the timeout requires worker processes.
+CODE_BLOCK_PYGMENTS_MAX_BYTES: int | None = getattr(settings, 'CODE_BLOCK_PYGMENTS_MAX_BYTES', None)
+CODE_BLOCK_PYGMENTS_MAX_LINES: int | None = getattr(settings, 'CODE_BLOCK_PYGMENTS_MAX_LINES', None)
+CODE_BLOCK_PYGMENTS_TIMEOUT: float | None = getattr(settings, 'CODE_BLOCK_PYGMENTS_TIMEOUT', None)
+CODE_BLOCK_PYGMENTS_WORKERS: int = int(getattr(settings, 'CODE_BLOCK_PYGMENTS_WORKERS', 2))
+
+# Shared (cross-process) highlight cache: a CACHES alias, or None to use only the per-process LRU cache.
+CODE_BLOCK_PYGMENTS_CACHE: str | None = getattr(settings, 'CODE_BLOCK_PYGMENTS_CACHE', None)
+CODE_BLOCK_PYGMENTS_CACHE_TIMEOUT: int | None = getattr(settings, 'CODE_BLOCK_PYGMENTS_CACHE_TIMEOUT', None)
+
+# Warm the highlight caches at startup: dotted path to a callable returning pages (or a queryset).
+CODE_BLOCK_PYGMENTS_WARM_PAGES: str | None = getattr(settings, 'CODE_BLOCK_PYGMENTS_WARM_PAGES', None)
+CODE_BLOCK_PYGMENTS_WARM_BUDGET: float | None = getattr(settings, 'CODE_BLOCK_PYGMENTS_WARM_BUDGET', 30)
+
+# Highlighter engines (dotted paths): the default, and overrides per language.
+CODE_BLOCK_PYGMENTS_BACKEND: str = getattr(
+    settings, 'CODE_BLOCK_PYGMENTS_BACKEND', 'code_blocks.util.pygments.backends.PygmentsBackend'
+)
+CODE_BLOCK_PYGMENTS_LANGUAGE_BACKENDS: dict[str, str] = dict(getattr(
+    settings, 'CODE_BLOCK_PYGMENTS_LANGUAGE_BACKENDS', {'text': 'code_blocks.util.pygments.backends.PlainTextBackend'}
+))
+
+# Instantiate (and compile) the lexers for CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES at startup.
+CODE_BLOCK_PYGMENTS_PRELOAD: bool = bool(getattr(settings, 'CODE_BLOCK_PYGMENTS_PRELOAD', True))
+CODE_BLOCK_PYGMENTS_FORMATTER_CACHE_SIZE: int = int(getattr(settings, 'CODE_BLOCK_PYGMENTS_FORMATTER_CACHE_SIZE', 256))
+
+# Attribute on the root element that forces a theme (e.g. 'data-theme' for [data-theme=dark]) in pair style sheets.
+CODE_BLOCK_PYGMENTS_THEME_ATTRIBUTE: str | None = getattr(settings, 'CODE_BLOCK_PYGMENTS_THEME_ATTRIBUTE', None)
+
+# Compare the fingerprint stored with a block's html at render time, re-highlighting stale html;
+# optionally write the fresh html back to the rendered page after the response. Html stored without
+# a fingerprint (before fingerprints) is served as is, unless STALE_CHECK_MISSING (see heal_code_blocks).
+CODE_BLOCK_PYGMENTS_STALE_CHECK: bool = bool(getattr(settings, 'CODE_BLOCK_PYGMENTS_STALE_CHECK', True))
+CODE_BLOCK_PYGMENTS_STALE_CHECK_MISSING: bool = bool(getattr(settings, 'CODE_BLOCK_PYGMENTS_STALE_CHECK_MISSING', False))
+CODE_BLOCK_PYGMENTS_STALE_WRITE_BACK: bool = bool(getattr(settings, 'CODE_BLOCK_PYGMENTS_STALE_WRITE_BACK', False))
+
+# Self-hosted monospace font: a directory under static code_blocks/fonts/, once generated (see
+# gen_code_block_font), or None to use the page's monospace font. Preloading emits <link rel=preload>
+# for the regular face.
+CODE_BLOCK_PYGMENTS_FONT: str | None = getattr(settings, 'CODE_BLOCK_PYGMENTS_FONT', None)
+CODE_BLOCK_PYGMENTS_FONT_PRELOAD: bool = bool(getattr(settings, 'CODE_BLOCK_PYGMENTS_FONT_PRELOAD', False))
+
 CODE_BLOCK_PYGMENTS_LINENO_CHOICES = (
     ('inline', 'Inline'),
     ('table', 'Table'),
@@ -79,3 +143,23 @@ def _make_name(alias: str, name: str) -> str:
 
 CODE_BLOCK_PYGMENTS_LANGUAGES: dict[str, str] = _get_languages(CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES_ONLY)
 CODE_BLOCK_PYGMENTS_STYLES: dict[str, str] = _get_styles()
+
+CODE_BLOCK_PYGMENTS_LANGUAGE_KEYS: frozenset[str] = frozenset(CODE_BLOCK_PYGMENTS_LANGUAGES)
+CODE_BLOCK_PYGMENTS_STYLE_KEYS: frozenset[str] = frozenset(CODE_BLOCK_PYGMENTS_STYLES)
+
+
+def _get_style_pairs():
+    pairs = tuple(
+        (light, dark) for light, dark in getattr(settings, 'CODE_BLOCK_PYGMENTS_STYLE_PAIRS', ())
+    )
+
+    for light, dark in pairs:
+        if light not in CODE_BLOCK_PYGMENTS_STYLES or dark not in CODE_BLOCK_PYGMENTS_STYLES:
+            raise ValueError(f"CODE_BLOCK_PYGMENTS_STYLE_PAIRS specifies unsupported styles: {light}, {dark}")
+
+    return pairs
+
+
+# Light/dark style pairs with combined style sheets (see gen_pygments_style_css). Blocks using a
+# listed pair get a single pair class, switched by prefers-color-scheme instead of by script.
+CODE_BLOCK_PYGMENTS_STYLE_PAIRS: tuple[tuple[str, str], ...] = _get_style_pairs()
@@ -0,0 +1,99 @@
+"""Language selection from file names and MIME types, without lexing the content.
+
+Much faster than ``guess_lexer`` for importing files: only lexer metadata is matched, and results
+are cached per file extension (or per name, for names that lexers match exactly or without one).
+"""
+import mimetypes
+import os
+from fnmatch import fnmatchcase
+from functools import lru_cache
+
+from pygments.lexers import find_lexer_class_for_filename, get_all_lexers
+
+from .defaults import CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES, CODE_BLOCK_PYGMENTS_LANGUAGE_KEYS
+
+__all__ = ("language_for_filename",)
+
+
+def language_for_filename(
+        filename: str, languages: frozenset[str] = CODE_BLOCK_PYGMENTS_LANGUAGE_KEYS, code: str | None = None
+) -> str | None:
+    """The first alias in ``languages`` of a lexer for the file name (or its MIME type), if any.
+
+    For extensions, aliases in ``CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES`` are preferred over the best
+    match, e.g. ``sql`` over ``tsql`` for ``.sql`` files. Names that lexers match exactly (e.g.
+    ``CMakeLists.txt``) keep their lexer. Extensions are matched case-sensitively first (``.R`` is
+    S, ``.C`` is C++), and if ``code`` is given, extensions of several lexers (e.g. ``.pl``) are
+    resolved by analysing it.
+    """
+    name = os.path.basename(filename)
+    stem, ext = os.path.splitext(name)
+
+    if stem and ext and name not in _exact_names():
+        names = f"_{ext}", f"_{ext.lower()}"
+    else:
+        names = name,
+
+    for name in dict.fromkeys(names):
+        if code is not None and len(_matching_lexers(name)) > 1:
+            lexer_class = find_lexer_class_for_filename(name, code)
+            language = _pick_language(name, ((lexer_class.aliases,) if lexer_class else ()) + _candidates(name), languages)
+        else:
+            language = _language_for_name(name, languages)
+
+        if language is not None:
+            return language
+
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _language_for_name(name, languages):
+    return _pick_language(name, _candidates(name), languages)
+
+
+def _pick_language(name, candidates, languages):
+    preferred = frozenset() if name in _exact_names() else languages & frozenset(CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES)
+
+    for accepted in (preferred, languages):
+        for aliases in candidates:
+            for alias in aliases:
+                if alias in accepted:
+                    return alias
+
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _candidates(name):
+    lexer_class = find_lexer_class_for_filename(name)
+
+    # The best match first, then other lexers for the name, or else for its MIME type (which
+    # mimetypes also looks up in lower case: ".C" would be C, not C++).
+    candidates = [lexer_class.aliases] if lexer_class else []
+    candidates += _matching_lexers(name)
+
+    mimetype, _ = (None, None) if candidates else mimetypes.guess_type(name, strict=False)
+
+    if mimetype:
+        candidates += [aliases for aliases, _, lexer_mimetypes in _lexers() if mimetype in lexer_mimetypes]
+
+    return tuple(candidates)
+
+
+@lru_cache(maxsize=4096)
+def _matching_lexers(name):
+    return tuple(aliases for aliases, patterns, _ in _lexers() if any(fnmatchcase(name, p) for p in patterns))
+
+
+@lru_cache(maxsize=None)
+def _lexers():
+    return tuple((aliases, filenames, lexer_mimetypes) for _, aliases, filenames, lexer_mimetypes in get_all_lexers())
+
+
+@lru_cache(maxsize=None)
+def _exact_names():
+    return frozenset(
+        pattern for _, filenames, _ in _lexers() for pattern in filenames
+        if not any(c in pattern for c in "*?[")
+    )
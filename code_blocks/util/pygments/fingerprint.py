@@ -0,0 +1,48 @@
+"""Fingerprints of highlighted output.
+
+A digest identifies the markup produced for a set of highlight arguments by the current engine:
+the Pygments version, the formatter's markup version, and the settings that change markup without
+being highlight arguments. It keys the shared highlight cache.
+
+A fingerprint is stored next to a code block's html to detect stale markup at render time. It
+leaves out the code, which is highlighted into the html whenever it's saved, so that checking it
+costs the same for any size of code.
+"""
+import hashlib
+
+import pygments
+
+from .defaults import (
+    CODE_BLOCK_PYGMENTS_BACKEND,
+    CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS,
+    CODE_BLOCK_PYGMENTS_LANGUAGE_BACKENDS,
+    CODE_BLOCK_PYGMENTS_STYLE_PAIRS,
+)
+from .formatter import CustomHtmlFormatter
+
+__all__ = (
+    "ENGINE_VERSION",
+    "digest",
+    "fingerprint",
+)
+
+_SETTINGS_HASH = hashlib.sha256(repr((
+    CODE_BLOCK_PYGMENTS_HIGHLIGHT_CLASS,
+    sorted(CODE_BLOCK_PYGMENTS_STYLE_PAIRS),
+    CODE_BLOCK_PYGMENTS_BACKEND,
+    sorted(CODE_BLOCK_PYGMENTS_LANGUAGE_BACKENDS.items()),
+)).encode()).hexdigest()[:8]
+
+# The position of the code in highlight() arguments.
+CODE_INDEX = 11
+
+ENGINE_VERSION = f"{pygments.__version__}:{CustomHtmlFormatter.markup_version}:{_SETTINGS_HASH}"
+
+
+def digest(args: tuple) -> str:
+    return hashlib.sha256(f"{ENGINE_VERSION}:{args!r}".encode()).hexdigest()
+
+
+def fingerprint(args: tuple) -> str:
+    """Short fingerprint of the engine and options of highlight() arguments, as stored with a block's html."""
+    return digest(args[:CODE_INDEX] + args[CODE_INDEX + 1:])[:16]
@@ -11,6 +11,9 @@ class CustomHtmlFormatter(HtmlFormatter):
     name = 'Code Blocks HTML'
     aliases = ['code_blocks_html']
 
+    # Bump when the markup changes for the same options; stale stored html is then re-highlighted.
+    markup_version = 3
+
     def __init__(self, *args, **kwds):
         self.max_height = kwds.pop('max_height', None)
         self.resizable = kwds.pop('resizable', False)
@@ -30,6 +33,40 @@ class CustomHtmlFormatter(HtmlFormatter):
 
         super().__init__(*args, **kwds)
 
+    def format_escaped_lines(self, lines, outfile):
+        """Write already-escaped lines of plain text, wrapped exactly like format().
+
+        This is format_unencoded() without the token-to-line step, for engines that don't lex.
+        """
+        lsep = self.lineseparator
+
+        if self.linenos or self.hl_lines or self.lineanchors or self.linespans:
+            source = ((1, line + lsep) for line in lines)
+        else:
+            # No line-oriented wrappers are active, so the body can pass through as one piece.
+            source = [(1, lsep.join(lines) + lsep)] if lines else []
+
+        if not self.nowrap and self.linenos == 2:
+            source = self._wrap_inlinelinenos(source)
+
+        if self.hl_lines:
+            source = self._highlight_lines(source)
+
+        if not self.nowrap:
+            if self.lineanchors:
+                source = self._wrap_lineanchors(source)
+            if self.linespans:
+                source = self._wrap_linespans(source)
+            source = self.wrap(source)
+            if self.linenos == 1:
+                source = self._wrap_tablelinenos(source)
+            source = self._wrap_div(source)
+            if self.full:
+                source = self._wrap_full(source, outfile)
+
+        for t, piece in source:
+            outfile.write(piece)
+
     def _wrap_div(self, inner):
         """An ugly copy-paste of the original method, but with rel=<title> for div tag."""
         style = []
@@ -41,6 +78,8 @@ class CustomHtmlFormatter(HtmlFormatter):
         style = '; '.join(style)
 
         fit_content = ' fit-content-width' if self.fit_content else ''
+
+        # For a configured light/dark pair, colorclass is the single pair class and there is no style_dark.
         light_dark_attrs = f' data-class-light="{self.colorclass}"' + (
             f' data-class-dark="{self.style_dark}"'
             if self.style_dark else ""
@@ -0,0 +1,247 @@
+"""Size- and time-bounded execution of highlighting work.
+
+Some lexers backtrack catastrophically on unusual input, so highlighting can be run in a small
+pool of pre-forked worker processes: a call that exceeds ``CODE_BLOCK_PYGMENTS_TIMEOUT`` has its
+worker killed and replaced, and the caller falls back to plain text. The pool is forked at startup
+(see ``HighlightPool.start``); each server process gets its own pool. Inputs larger than
+``CODE_BLOCK_PYGMENTS_MAX_BYTES`` or ``CODE_BLOCK_PYGMENTS_MAX_LINES`` are rejected up front.
+
+Violations are logged and passed to any functions registered with the
+``code_blocks_highlight_limit_exceeded`` Wagtail hook, as keyword arguments
+(``reason``, ``detail``, plus caller-supplied context such as ``language``).
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+
+from wagtail import hooks
+
+from .defaults import (
+    CODE_BLOCK_PYGMENTS_MAX_BYTES,
+    CODE_BLOCK_PYGMENTS_MAX_LINES,
+    CODE_BLOCK_PYGMENTS_TIMEOUT,
+    CODE_BLOCK_PYGMENTS_WORKERS,
+)
+
+__all__ = (
+    "HighlightLimitExceeded",
+    "HighlightPool",
+    "check_limits",
+    "get_pool",
+    "report_limit",
+    "run_guarded",
+    "start_pool",
+)
+
+logger = logging.getLogger(__name__)
+
+LIMIT_HOOK = "code_blocks_highlight_limit_exceeded"
+
+# Reasons that depend on the pool's state rather than on the input.
+TRANSIENT_REASONS = frozenset({"busy", "crashed"})
+
+# Seconds to wait for a new worker to start up (and set up Django, if spawned).
+WORKER_STARTUP_TIMEOUT = 60
+
+
+class HighlightLimitExceeded(Exception):
+    """Raised when a highlighting call is rejected or aborted.
+
+    ``reason`` is one of ``"bytes"``, ``"lines"``, ``"timeout"``, ``"busy"`` or ``"crashed"``.
+    The last two are ``transient``: the same call may succeed later, so their fallback must not be
+    cached or stored.
+    """
+    def __init__(self, reason, detail=None):
+        self.reason = reason
+        self.detail = detail
+        super().__init__(f"Highlight limit exceeded ({reason}): {detail}" if detail is not None else reason)
+
+    def __reduce__(self):
+        # Keep reason and detail when raised in a worker process.
+        return type(self), (self.reason, self.detail)
+
+    @property
+    def transient(self) -> bool:
+        return self.reason in TRANSIENT_REASONS
+
+
+def check_limits(code, max_bytes=CODE_BLOCK_PYGMENTS_MAX_BYTES, max_lines=CODE_BLOCK_PYGMENTS_MAX_LINES):
+    if max_bytes is not None:
+        size = len(code.encode())
+
+        if size > max_bytes:
+            raise HighlightLimitExceeded("bytes", size)
+
+    if max_lines is not None:
+        lines = code.count("\n") + 1
+
+        if lines > max_lines:
+            raise HighlightLimitExceeded("lines", lines)
+
+
+def report_limit(exc, **info):
+    logger.warning("%s %s", exc, info)
+
+    for fn in hooks.get_hooks(LIMIT_HOOK):
+        fn(reason=exc.reason, detail=exc.detail, **info)
+
+
+_in_worker = False
+
+
+def _worker_main(conn, setup_django):
+    global _in_worker
+    _in_worker = True
+
+    if setup_django:
+        import django
+        django.setup()
+
+    conn.send((True, None))
+
+    while True:
+        try:
+            func, args, kwds = conn.recv()
+        except (EOFError, OSError):
+            return
+
+        try:
+            result = True, func(*args, **kwds)
+        except Exception as exc:
+            result = False, exc
+
+        try:
+            conn.send(result)
+        except Exception as exc:  # Unpicklable result or exception.
+            conn.send((False, RuntimeError(repr(exc))))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.ready = False
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, context.get_start_method() != "fork"),
+            name="code-blocks-highlight",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self, timeout=None):
+        """Wait for the worker's startup (Django setup in spawned workers), outside of the call timeout."""
+        if not self.ready:
+            if not self.conn.poll(timeout):
+                raise HighlightLimitExceeded("crashed", "startup timed out")
+
+            self.conn.recv()
+            self.ready = True
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class HighlightPool:
+    """A fixed-size pool of highlighting worker processes with per-call timeouts.
+
+    ``start()`` forks the workers, and must be called from the main thread before serving: it's
+    called by ``AppConfig.ready`` when ``CODE_BLOCK_PYGMENTS_TIMEOUT`` is set. Each server process
+    needs its own pool, so servers that fork after loading the app (e.g. gunicorn with ``--preload``)
+    should call ``get_pool().start()`` in their post-fork hook.
+
+    Workers started later, as replacements for killed workers or in a process that inherited the
+    pool without calling ``start()``, are spawned instead (forking from a request thread could copy
+    locks held by other threads), and set up Django before their first call.
+    """
+    def __init__(self, workers=CODE_BLOCK_PYGMENTS_WORKERS, timeout=CODE_BLOCK_PYGMENTS_TIMEOUT):
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        self.spawn_context = multiprocessing.get_context("spawn")
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = None
+        self._pid = None
+
+    def start(self, context=None):
+        """Start the workers for this process (forking them by default), unless already started."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._idle = queue.Queue()
+                self._pid = os.getpid()
+
+                for _ in range(self.workers):
+                    self._idle.put(_Worker(context or self.context))
+
+        return self
+
+    def run(self, func, *args, **kwds):
+        """Call ``func(*args, **kwds)`` in a worker; ``func`` and its arguments must be picklable."""
+        idle = self.start(self.spawn_context)._idle
+
+        try:
+            worker = idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise HighlightLimitExceeded("busy", self.timeout)
+
+        try:
+            worker.wait_ready(WORKER_STARTUP_TIMEOUT)
+            worker.conn.send((func, args, kwds))
+
+            if not worker.conn.poll(self.timeout):
+                raise HighlightLimitExceeded("timeout", self.timeout)
+
+            ok, result = worker.conn.recv()
+
+        except HighlightLimitExceeded:
+            worker.kill()
+            worker = _Worker(self.spawn_context)
+            raise
+
+        except (EOFError, OSError) as exc:
+            worker.kill()
+            worker = _Worker(self.spawn_context)
+            raise HighlightLimitExceeded("crashed", repr(exc)) from exc
+
+        finally:
+            idle.put(worker)
+
+        if not ok:
+            raise result
+
+        return result
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = HighlightPool()
+
+        return _pool
+
+
+def start_pool():
+    """Start the worker pool for this process if a timeout is set (see ``HighlightPool.start``)."""
+    if CODE_BLOCK_PYGMENTS_TIMEOUT is not None and not _in_worker:
+        get_pool().start()
+
+
+def run_guarded(code, func, *args, **kwds):
+    """Check ``code`` against the size limits, then call ``func`` (in the worker pool if a timeout is set)."""
+    check_limits(code)
+
+    if CODE_BLOCK_PYGMENTS_TIMEOUT is None:
+        return func(*args, **kwds)
+
+    return get_pool().run(func, *args, **kwds)
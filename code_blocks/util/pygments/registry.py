@@ -0,0 +1,69 @@
+"""Shared language/style registry for the admin.
+
+Block definitions reference the registry by name instead of embedding the full choice lists,
+which are served once (see ``code_blocks.views.pygments_registry``) and validated server-side
+against frozen sets.
+"""
+import hashlib
+import json
+from functools import cache
+
+from django.core.exceptions import ValidationError
+
+from .defaults import (
+    CODE_BLOCK_PYGMENTS_LANGUAGES,
+    CODE_BLOCK_PYGMENTS_LANGUAGE_KEYS,
+    CODE_BLOCK_PYGMENTS_STYLES,
+    CODE_BLOCK_PYGMENTS_STYLE_KEYS,
+)
+
+__all__ = (
+    "REGISTRIES",
+    "RegistryValidator",
+    "registry_json",
+    "registry_version",
+)
+
+REGISTRIES: dict[str, tuple[dict[str, str], frozenset[str]]] = {
+    "languages": (CODE_BLOCK_PYGMENTS_LANGUAGES, CODE_BLOCK_PYGMENTS_LANGUAGE_KEYS),
+    "styles": (CODE_BLOCK_PYGMENTS_STYLES, CODE_BLOCK_PYGMENTS_STYLE_KEYS),
+}
+
+
+class RegistryValidator:
+    """Validate that a value is a key of the named registry."""
+
+    def __init__(self, registry: str):
+        if registry not in REGISTRIES:
+            raise ValueError(f"Invalid registry: {registry}")
+
+        self.registry = registry
+        self.keys = REGISTRIES[registry][1]
+
+    def __call__(self, value):
+        if value not in self.keys:
+            raise ValidationError(
+                "Select a valid choice. %(value)s is not one of the available choices.",
+                code="invalid_choice",
+                params={"value": value},
+            )
+
+    def __eq__(self, other):
+        return isinstance(other, RegistryValidator) and other.registry == self.registry
+
+    def deconstruct(self):
+        return f"{__name__}.{self.__class__.__name__}", (self.registry,), {}
+
+
+@cache
+def registry_json() -> bytes:
+    # Lists of pairs rather than objects, so that ordering survives any JSON consumer.
+    return json.dumps(
+        {name: list(choices.items()) for name, (choices, _) in REGISTRIES.items()},
+        separators=(",", ":"),
+    ).encode()
+
+
+@cache
+def registry_version() -> str:
+    return hashlib.sha1(registry_json()).hexdigest()[:12]
@@ -0,0 +1,35 @@
+from functools import wraps
+
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_GET
+
+from .util.pygments.registry import registry_json, registry_version
+
+# The registry URL carries the version, so responses can be cached for a long time (see keep_cache_headers,
+# as Wagtail marks all admin responses as uncacheable).
+REGISTRY_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def keep_cache_headers(view, **cache_kwargs):
+    """Wrap an (already decorated) admin view to replace its never_cache headers with ``cache_kwargs``."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response.headers.pop("Expires", None)
+            response.headers.pop("Cache-Control", None)
+            patch_cache_control(response, **cache_kwargs)
+
+        return response
+
+    return wrapper
+
+
+@require_GET
+@cache_control(private=True, max_age=REGISTRY_MAX_AGE)
+@etag(lambda request: registry_version())
+def pygments_registry(request):
+    return HttpResponse(registry_json(), content_type="application/json")
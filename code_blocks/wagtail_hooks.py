@@ -0,0 +1,36 @@
+from django.urls import path
+from django.urls.resolvers import URLPattern
+from wagtail import hooks
+
+from . import views
+
+
+class CacheableURLPattern(URLPattern):
+    """Admin URL pattern whose view keeps its own cache headers.
+
+    Wagtail wraps the callbacks of admin URLs in never_cache. The view resolved here is wrapped
+    again, outside of that, to restore ``cache_kwargs``.
+    """
+    def __init__(self, *args, cache_kwargs, **kwds):
+        super().__init__(*args, **kwds)
+        self.cache_kwargs = cache_kwargs
+
+    def resolve(self, path):
+        match = super().resolve(path)
+
+        if match:
+            match.func = views.keep_cache_headers(match.func, **self.cache_kwargs)
+
+        return match
+
+
+@hooks.register("register_admin_urls")
+def register_admin_urls():
+    pattern = path("code-blocks/pygments/registry.json", views.pygments_registry, name="code_blocks_pygments_registry")
+
+    return [
+        CacheableURLPattern(
+            pattern.pattern, pattern.callback, pattern.default_args, pattern.name,
+            cache_kwargs={"private": True, "max_age": views.REGISTRY_MAX_AGE},
+        ),
+    ]
@@ -1,10 +1,97 @@
+"""Settings for the bundled load-test project.
+
+Runs fully offline: SQLite, local-memory caches, no external services.
+Usage: ``python -m www migrate``, ``python -m www loadtest_data``, ``python -m www loadtest_run``.
+"""
+import os
 from pathlib import Path
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+WWW_DIR = BASE_DIR / "www"
 
-DEBUG = True
+DEBUG = bool(os.environ.get("WWW_DEBUG", ""))
+SECRET_KEY = "www-load-test-only"
+ALLOWED_HOSTS = ["*"]
 
 INSTALLED_APPS = [
     "code_blocks",
+    "www.loadtest",
+
+    "wagtail.admin",
+    "wagtail.users",
+    "wagtail.images",
+    "wagtail.documents",
+    "wagtail.sites",
+    "wagtail",
+
+    "modelcluster",
+    "taggit",
+
+    "django.contrib.admin",
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+]
+
+MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+]
+
+ROOT_URLCONF = "www.urls"
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+                "django.contrib.messages.context_processors.messages",
+            ],
+        },
+    },
 ]
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("WWW_DATABASE", WWW_DIR / "db.sqlite3"),
+    },
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "code_blocks": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "code_blocks",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Fast hashing for the generated admin user.
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+USE_TZ = True
+
+STATIC_URL = "/static/"
+STATIC_ROOT = WWW_DIR / "static"
+
+WAGTAIL_SITE_NAME = "Code Blocks Load Test"
+WAGTAILADMIN_BASE_URL = "http://localhost:8000"
+WAGTAILADMIN_COMMENTS_ENABLED = False
+WAGTAILSEARCH_BACKENDS = {"default": {"BACKEND": "wagtail.search.backends.database"}}
+
+CODE_BLOCK_PYGMENTS_DEFAULT_LANGUAGES = ["auto", "python", "javascript", "bash", "sql", "c", "html", "text"]
+CODE_BLOCK_PYGMENTS_CACHE = "code_blocks"
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class LoadTestAppConfig(AppConfig):
+    name = 'www.loadtest'
+    label = 'loadtest'
+    verbose_name = 'Code Blocks Load Test'
+    default_auto_field = 'django.db.models.BigAutoField'
@@ -0,0 +1,119 @@
+import random
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from wagtail.models import Site
+
+from www.loadtest.models import CodeBlockPage
+from www.loadtest.samples import sample_auto_code, sample_code
+
+ADMIN_USERNAME = "loadtest"
+ADMIN_PASSWORD = "loadtest"
+
+
+class Command(BaseCommand):
+    help = "Generate load-test pages with code blocks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', action="store", type=int, default=20, help="Number of pages.")
+        parser.add_argument('--blocks', action="store", type=int, default=10, help="Code blocks per page.")
+        parser.add_argument('--lines', action="store", type=int, nargs=2, default=[10, 200],
+                            metavar=("MIN", "MAX"), help="Lines per code block (range).")
+        parser.add_argument('--languages', action="store", nargs="+",
+                            default=["python", "javascript", "bash", "sql", "c", "html", "text", "auto"],
+                            help="Languages to draw from (may include 'auto').")
+        parser.add_argument('--linenos', action="store", type=float, default=0.2,
+                            help="Fraction of blocks with line numbers.")
+        parser.add_argument('--editable', action="store", type=float, default=0.1,
+                            help="Fraction of blocks that are editable plain text.")
+        parser.add_argument('--legacy', action="store", type=float, default=0.0,
+                            help="Fraction of blocks stored without baked html (and 'auto' unresolved).")
+        parser.add_argument('--seed', action="store", type=int, default=1, help="Random seed.")
+        parser.add_argument('--clear', action="store_true", help="Delete existing load-test pages first.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        min_lines, max_lines = options["lines"]
+
+        if not 0 < min_lines <= max_lines:
+            raise CommandError("--lines must be a positive range.")
+
+        site = Site.objects.filter(is_default_site=True).select_related("root_page").first()
+
+        if site is None:
+            raise CommandError("No default site; run migrate first.")
+
+        root = site.root_page
+
+        if options["clear"]:
+            for page in CodeBlockPage.objects.child_of(root):
+                page.delete()
+
+        self.ensure_admin_user()
+
+        block = CodeBlockPage.body.field.stream_block
+        existing = CodeBlockPage.objects.count()
+
+        for index in range(options["pages"]):
+            body = [
+                self.make_block(block, rng, options, rng.randint(min_lines, max_lines))
+                for _ in range(options["blocks"])
+            ]
+
+            number = existing + index + 1
+            page = CodeBlockPage(title=f"Load test page {number}", slug=f"load-test-{number}", body=body)
+            root.add_child(instance=page)
+            page.save_revision().publish()
+
+            print(f"Created {page.url} ({len(body)} blocks)", file=sys.stderr)
+
+    @staticmethod
+    def ensure_admin_user():
+        user_model = get_user_model()
+
+        if not user_model.objects.filter(username=ADMIN_USERNAME).exists():
+            user_model.objects.create_superuser(ADMIN_USERNAME, "loadtest@example.com", ADMIN_PASSWORD)
+
+    @staticmethod
+    def make_block(stream_block, rng, options, lines):
+        language = rng.choice(options["languages"])
+        editable = rng.random() < options["editable"]
+        linenos = None if editable else (rng.choice(["inline", "table"]) if rng.random() < options["linenos"] else None)
+        block_type = "code_full" if editable or linenos else "code"
+
+        if editable:
+            language = "text"
+
+        if language == "auto":
+            code = sample_auto_code(lines, rng)
+        else:
+            code = sample_code(language, lines, rng)
+
+        raw = {
+            "language": language,
+            "style": rng.choice(["default", "friendly", "monokai", "github-dark"]),
+            "style_dark": rng.choice(["", "monokai"]),
+            "heading": rng.choice(["", "", f"Example ({lines} lines)"]),
+            "corner_text": "",
+            "show_corner_text": True,
+            "max_height": rng.choice([None, None, 400]),
+            "resizable": rng.random() < 0.2,
+            "fit_content": rng.random() < 0.1,
+            "code": code,
+            "html": "",
+        }
+
+        child_block = stream_block.child_blocks[block_type]
+
+        if block_type == "code_full":
+            raw["editable"] = editable
+            raw["linenos"] = linenos
+
+        value = child_block.to_python(raw)
+
+        # Bake html the way an admin save does, unless simulating legacy content.
+        if rng.random() >= options["legacy"]:
+            value = child_block.clean(value)
+
+        return block_type, value
@@ -0,0 +1,162 @@
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from wagtail.test.utils.form_data import nested_form_data, streamfield
+
+from code_blocks.blocks.pygments import PygmentsCodeBlock
+from code_blocks.util.pygments.cache import get_cache
+from www.loadtest.models import CodeBlockPage
+
+from .loadtest_data import ADMIN_USERNAME
+
+SCENARIOS = ("render", "save", "preview-cold", "preview-warm")
+
+
+def clear_highlight_caches():
+    PygmentsCodeBlock.highlight.cache_clear()
+    PygmentsCodeBlock.get_formatter.cache_clear()
+
+    cache = get_cache()
+
+    if cache is not None:
+        cache.clear()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def block_form_data(block, value):
+    data = {}
+
+    for name, child_block in block.child_blocks.items():
+        child_value = value.get(name)
+
+        if isinstance(child_value, bool):
+            child_value = "on" if child_value else ""
+
+        data[name] = "" if child_value is None else child_value
+
+    data["html"] = ""
+    return data
+
+
+def page_form_data(page):
+    body = streamfield([
+        (child.block_type, block_form_data(child.block, child.value))
+        for child in page.body
+    ])
+
+    # Post the block ids like the editor does, so that saves keep them instead of creating new blocks.
+    for index, child in enumerate(page.body):
+        body[str(index)]["id"] = child.id
+
+    return nested_form_data({
+        "title": page.title,
+        "slug": page.slug,
+        "body": body,
+    })
+
+
+class Command(BaseCommand):
+    help = "Measure page render, admin save and preview throughput against generated load-test pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', action="store", type=int, default=50,
+                            help="Measured requests per scenario.")
+        parser.add_argument('--warmup', action="store", type=int, default=5,
+                            help="Unmeasured requests per scenario before measuring.")
+        parser.add_argument('--scenarios', action="store", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+        parser.add_argument('--json', action="store", type=str, help="Also write results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        pages = list(CodeBlockPage.objects.live().order_by("pk"))
+
+        if not pages:
+            raise CommandError("No load-test pages; run loadtest_data first.")
+
+        client = Client()
+        client.force_login(get_user_model().objects.get(username=ADMIN_USERNAME))
+
+        results = {}
+
+        for scenario in options["scenarios"]:
+            run = getattr(self, f"run_{scenario.replace('-', '_')}")
+            form_data = {}
+
+            def request(i):
+                page = pages[i % len(pages)]
+
+                if scenario != "render" and page.pk not in form_data:
+                    form_data[page.pk] = page_form_data(page)
+
+                return run(client, page, form_data.get(page.pk))
+
+            for i in range(options["warmup"]):
+                request(i)
+
+            timings = []
+            errors = 0
+            started = time.perf_counter()
+
+            for i in range(options["requests"]):
+                if scenario == "preview-cold":
+                    clear_highlight_caches()
+
+                t = time.perf_counter()
+                ok = request(i)
+                timings.append((time.perf_counter() - t) * 1000)
+                errors += not ok
+
+            elapsed = time.perf_counter() - started
+
+            results[scenario] = {
+                "requests": len(timings),
+                "errors": errors,
+                "rps": round(len(timings) / elapsed, 2),
+                "p50_ms": round(percentile(timings, 0.50), 2),
+                "p99_ms": round(percentile(timings, 0.99), 2),
+                "max_ms": round(max(timings), 2),
+            }
+
+        print(f"{'scenario':<14} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+
+        for scenario, result in results.items():
+            print(
+                f"{scenario:<14} {result['requests']:>8} {result['errors']:>6} {result['rps']:>8.2f}"
+                f" {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['max_ms']:>8.2f}"
+            )
+
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump({"pages": len(pages), "results": results}, file, indent=2)
+
+            print(f"Wrote {options['json']}", file=sys.stderr)
+
+    @staticmethod
+    def run_render(client, page, form_data):
+        return client.get(page.url).status_code == 200
+
+    @staticmethod
+    def run_save(client, page, form_data):
+        response = client.post(reverse("wagtailadmin_pages:edit", args=[page.pk]), form_data)
+        return response.status_code == 302
+
+    @staticmethod
+    def run_preview(client, page, form_data):
+        url = reverse("wagtailadmin_pages:preview_on_edit", args=[page.pk])
+        response = client.post(url, form_data)
+
+        if response.status_code != 200 or not response.json().get("is_valid"):
+            return False
+
+        return client.get(url).status_code == 200
+
+    run_preview_cold = run_preview
+    run_preview_warm = run_preview
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:38
+
+import django.db.models.deletion
+import wagtail.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('wagtailcore', '0089_log_entry_data_json_null_to_object'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeBlockPage',
+            fields=[
+                ('page_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='wagtailcore.page')),
+                ('body', wagtail.fields.StreamField([('code', 11), ('code_full', 13)], blank=True, block_lookup={0: ('code_blocks.blocks.pygments.block.RegistryChoiceBlock', ('languages',), {'default': 'auto'}), 1: ('code_blocks.blocks.pygments.block.RegistryChoiceBlock', ('styles',), {'default': 'abap'}), 2: ('code_blocks.blocks.pygments.block.RegistryChoiceBlock', ('styles',), {'required': False}), 3: ('wagtail.blocks.CharBlock', (), {'default': '', 'required': False}), 4: ('wagtail.blocks.CharBlock', (), {'default': '', 'help_text': 'Defaults to language name.', 'required': False}), 5: ('wagtail.blocks.BooleanBlock', (), {'default': True, 'required': False}), 6: ('wagtail.blocks.IntegerBlock', (), {'default': None, 'min_value': 40, 'required': False}), 7: ('wagtail.blocks.BooleanBlock', (), {'default': False, 'required': False}), 8: ('wagtail.blocks.BooleanBlock', (), {'default': False, 'help_text': 'Fit width to content (and make horizontally resizable if resizable).', 'required': False}), 9: ('wagtail.blocks.TextBlock', (), {'form_classname': 'code-block-code'}), 10: ('code_blocks.blocks.pygments.block.HtmlFieldBlock', (), {}), 11: ('wagtail.blocks.StructBlock', [[('language', 0), ('style', 1), ('style_dark', 2), ('heading', 3), ('corner_text', 4), ('show_corner_text', 5), ('max_height', 6), ('resizable', 7), ('fit_content', 8), ('code', 9), ('html', 10)]], {}), 12: ('wagtail.blocks.ChoiceBlock', [], {'choices': [('inline', 'Inline'), ('table', 'Table')], 'required': False}), 13: ('wagtail.blocks.StructBlock', [[('language', 0), ('style', 1), ('style_dark', 2), ('heading', 3), ('corner_text', 4), ('show_corner_text', 5), ('linenos', 12), ('max_height', 6), ('resizable', 7), ('fit_content', 8), ('editable', 7), ('code', 9), ('html', 10)]], {})})),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=('wagtailcore.page',),
+        ),
+    ]
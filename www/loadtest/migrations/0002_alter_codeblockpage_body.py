@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:43
+
+import wagtail.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loadtest', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='codeblockpage',
+            name='body',
+            field=wagtail.fields.StreamField([('code', 12), ('code_full', 14)], blank=True, block_lookup={0: ('code_blocks.blocks.pygments.block.RegistryChoiceBlock', ('languages',), {'default': 'auto'}), 1: ('code_blocks.blocks.pygments.block.RegistryChoiceBlock', ('styles',), {'default': 'abap'}), 2: ('code_blocks.blocks.pygments.block.RegistryChoiceBlock', ('styles',), {'required': False}), 3: ('wagtail.blocks.CharBlock', (), {'default': '', 'required': False}), 4: ('wagtail.blocks.CharBlock', (), {'default': '', 'help_text': 'Defaults to language name.', 'required': False}), 5: ('wagtail.blocks.BooleanBlock', (), {'default': True, 'required': False}), 6: ('wagtail.blocks.IntegerBlock', (), {'default': None, 'min_value': 40, 'required': False}), 7: ('wagtail.blocks.BooleanBlock', (), {'default': False, 'required': False}), 8: ('wagtail.blocks.BooleanBlock', (), {'default': False, 'help_text': 'Fit width to content (and make horizontally resizable if resizable).', 'required': False}), 9: ('wagtail.blocks.TextBlock', (), {'form_classname': 'code-block-code'}), 10: ('code_blocks.blocks.pygments.block.HtmlFieldBlock', (), {}), 11: ('code_blocks.blocks.pygments.block.FingerprintFieldBlock', (), {}), 12: ('wagtail.blocks.StructBlock', [[('language', 0), ('style', 1), ('style_dark', 2), ('heading', 3), ('corner_text', 4), ('show_corner_text', 5), ('max_height', 6), ('resizable', 7), ('fit_content', 8), ('code', 9), ('html', 10), ('fingerprint', 11)]], {}), 13: ('wagtail.blocks.ChoiceBlock', [], {'choices': [('inline', 'Inline'), ('table', 'Table')], 'required': False}), 14: ('wagtail.blocks.StructBlock', [[('language', 0), ('style', 1), ('style_dark', 2), ('heading', 3), ('corner_text', 4), ('show_corner_text', 5), ('linenos', 13), ('max_height', 6), ('resizable', 7), ('fit_content', 8), ('editable', 7), ('code', 9), ('html', 10), ('fingerprint', 11)]], {})}),
+        ),
+    ]
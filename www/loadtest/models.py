@@ -0,0 +1,22 @@
+from wagtail.admin.panels import FieldPanel
+from wagtail.fields import StreamField
+from wagtail.models import Page
+
+from code_blocks.blocks.pygments import PygmentsCodeBlock
+
+
+class FullCodeBlock(PygmentsCodeBlock):
+    """Code block with line numbers and editing available."""
+    class Meta:
+        hidden = {}
+
+
+class CodeBlockPage(Page):
+    body = StreamField([
+        ("code", PygmentsCodeBlock()),
+        ("code_full", FullCodeBlock()),
+    ], blank=True)
+
+    content_panels = Page.content_panels + [
+        FieldPanel("body"),
+    ]
@@ -0,0 +1,76 @@
+"""Deterministic, code-like sample text per language for generated load-test content."""
+import random
+
+SNIPPETS = {
+    "python": [
+        "def handler_{n}(request, *args, **kwargs):",
+        "    value = compute(args[{n}] if args else {n}, key=\"item-{n}\")",
+        "    for i in range({n}):",
+        "        yield {{\"index\": i, \"value\": value * i}}  # <note> & more",
+        "class Model{n}(Base):",
+        "    \"\"\"Docstring for model {n}.\"\"\"",
+        "    items: list[int] = [{n}, {n} + 1, {n} * 2]",
+        "    return sorted(items, key=lambda x: -x)",
+        "import os, sys",
+    ],
+    "javascript": [
+        "function handler{n}(event) {{",
+        "  const value = event.detail?.value ?? {n};",
+        "  for (let i = 0; i < {n}; i++) {{ console.log(`item ${{i}}`, value); }}",
+        "  return items.map((x) => x * {n}).filter(Boolean);",
+        "}}",
+        "export const config{n} = {{ key: 'item-{n}', enabled: true }};",
+        "document.querySelectorAll('.item-{n}').forEach((el) => el.remove());",
+    ],
+    "bash": [
+        "for f in /var/log/app-{n}/*.log; do",
+        "  grep -E 'ERROR|WARN' \"$f\" | tee -a /tmp/out-{n}.txt",
+        "done",
+        "export VALUE_{n}=\"$(date +%s)\"",
+        "if [[ -n \"$VALUE_{n}\" ]]; then echo \"ok {n}\" >&2; fi",
+    ],
+    "sql": [
+        "SELECT id, name, created_at FROM items_{n}",
+        "  WHERE status = 'active' AND score > {n}",
+        "  ORDER BY created_at DESC LIMIT {n};",
+        "UPDATE items_{n} SET score = score + 1 WHERE id IN (SELECT id FROM queue);",
+        "CREATE INDEX idx_items_{n} ON items_{n} (status, created_at);",
+    ],
+    "c": [
+        "static int handler_{n}(const char *buf, size_t len) {{",
+        "    for (size_t i = 0; i < len; i++) {{ total += buf[i] * {n}; }}",
+        "    return total > {n} ? -1 : 0;",
+        "}}",
+        "#define ITEM_{n} ({n} << 2)",
+        "struct item_{n} {{ int id; char name[{n}]; }};",
+    ],
+    "html": [
+        "<div class=\"item-{n}\" data-value=\"{n}\">",
+        "  <a href=\"/items/{n}/?q=a&amp;b=c\">Item {n}</a>",
+        "  <span title=\"Item {n}\">&lt;{n}&gt;</span>",
+        "</div>",
+    ],
+    "text": [
+        "2024-01-01T00:00:{n:02d}Z INFO worker-{n} processed request id={n} status=200",
+        "2024-01-01T00:00:{n:02d}Z WARN worker-{n} slow response <{n} ms> & retry",
+        "    at module.function_{n} (file_{n}.js:{n}:10)",
+        "Traceback (most recent call last): item {n}",
+    ],
+}
+
+# Languages without their own snippets get C-like text.
+FALLBACK = "c"
+
+
+def sample_code(language, lines, rng: random.Random):
+    snippets = SNIPPETS.get(language, SNIPPETS[FALLBACK])
+
+    return "\n".join(
+        rng.choice(snippets).format(n=rng.randint(0, 59))
+        for _ in range(lines)
+    ) + "\n"
+
+
+def sample_auto_code(lines, rng: random.Random):
+    """Code for "auto" blocks, from languages the guesser detects reliably."""
+    return sample_code(rng.choice(["python", "html", "bash"]), lines, rng)